@@ -1 +1,6 @@
-python3 src/evaluation.py --api_key $API_KEY --model_name "claude-haiku-4-5" --output_file_path "results/out-claude-haiku-4-5.json" --mode "text"
\ No newline at end of file
+# Reproduce every published results/out-*.json in one process.
+# API keys come from ANTHROPIC_API_KEY, OPENAI_API_KEY and GEMINI_API_KEY (falling back to API_KEY).
+python3 src/sweep.py --spec scripts/sweep_published.json --cache_path .cache/responses.db
+
+# Single model:
+# python3 src/evaluation.py --api_key $API_KEY --model_name "claude-haiku-4-5" --output_file_path "results/out-claude-haiku-4-5.json" --mode "text"
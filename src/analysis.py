@@ -0,0 +1,215 @@
+"""Confidence intervals and paired significance tests for saved result files.
+
+Per-item correctness of every model is loaded into a (models, items) matrix
+aligned on unicode. Accuracy intervals come from a bootstrap stratified by
+category; pairs of models are compared with an exact McNemar test and a
+paired sign-flip permutation test, with a Holm correction across pairs.
+"""
+import argparse
+import glob
+import json
+import math
+import time
+
+import numpy as np
+
+from utils.journal import result_key
+
+
+def load_matrix(paths):
+    """(labels, keys, categories, correct) for the items present in every file.
+
+    `correct` is a (models, items) bool matrix; items follow the first file's order."""
+    labels, rows = [], []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            output = json.load(f)
+        label = output["model"] if output.get("mode", "text") == "text" else f"{output['model']}/{output['mode']}"
+        labels.append(label)
+        rows.append({result_key(r): r for r in output["detailed_results"]})
+
+    shared = set(rows[0]).intersection(*rows[1:])
+    keys = [key for key in rows[0] if key in shared]
+    dropped = max(len(r) for r in rows) - len(keys)
+    if dropped:
+        print(f"Comparing the {len(keys)} items every file answered ({dropped} left out)")
+    categories = np.array([rows[0][key]["category"] for key in keys])
+    correct = np.array([[row[key]["correct"] for key in keys] for row in rows], dtype=bool)
+    return labels, keys, categories, correct
+
+
+def resample_counts(rng, n, resamples):
+    """(resamples, n) array: how often each of n items is drawn in each bootstrap resample."""
+    draws = rng.integers(0, n, size=(resamples, n))
+    draws += (np.arange(resamples) * n)[:, None]
+    return np.bincount(draws.ravel(), minlength=resamples * n).reshape(resamples, n)
+
+
+def stratified_bootstrap(correct, categories, resamples=10000, rng=None):
+    """Bootstrap resamples of accuracy, drawn within each category.
+
+    Returns (micro, macro, per_category): (resamples, models) arrays for micro
+    and macro accuracy, and {category: (resamples, models)} accuracies."""
+    rng = rng if rng is not None else np.random.default_rng(0)
+    values = correct.astype(np.float64)
+    per_category = {}
+    for cat in sorted(set(categories)):
+        members = np.flatnonzero(categories == cat)
+        counts = resample_counts(rng, len(members), resamples).astype(np.float64)
+        per_category[cat] = counts @ values[:, members].T / len(members)
+
+    sizes = np.array([np.sum(categories == cat) for cat in per_category], dtype=np.float64)
+    stacked = np.stack(list(per_category.values()))  # (categories, resamples, models)
+    micro = np.tensordot(sizes, stacked, axes=1) / sizes.sum()
+    macro = stacked.mean(axis=0)
+    return micro, macro, per_category
+
+
+def interval(samples, confidence):
+    """Percentile interval of bootstrap samples along axis 0."""
+    tail = (1 - confidence) / 2 * 100
+    return np.percentile(samples, [tail, 100 - tail], axis=0)
+
+
+def mcnemar_exact(b, c):
+    """Two-sided exact McNemar p-value for b and c discordant pairs."""
+    n = b + c
+    if n == 0:
+        return 1.0
+    tail = sum(math.comb(n, k) for k in range(min(b, c) + 1))
+    return min(1.0, 2 * tail / 2 ** n)
+
+
+def permutation_test(a, b, permutations=10000, rng=None):
+    """Two-sided paired sign-flip test of mean(a - b) for bool vectors a and b."""
+    rng = rng if rng is not None else np.random.default_rng(0)
+    diff = a.astype(np.int8) - b.astype(np.int8)
+    # concordant items contribute zero under every flip
+    discordant = diff[diff != 0].astype(np.float32)
+    if len(discordant) == 0:
+        return 1.0
+    observed = abs(discordant.sum())
+    signs = rng.integers(0, 2, size=(permutations, len(discordant)), dtype=np.int8) * 2 - 1
+    flipped = np.abs(signs.astype(np.float32) @ discordant)
+    return float((np.sum(flipped >= observed - 1e-6) + 1) / (permutations + 1))
+
+
+def holm(p_values):
+    """Holm-Bonferroni adjusted p-values."""
+    order = np.argsort(p_values)
+    adjusted = np.empty(len(p_values))
+    running = 0.0
+    for rank, i in enumerate(order):
+        running = max(running, min(1.0, (len(p_values) - rank) * p_values[i]))
+        adjusted[i] = running
+    return adjusted.tolist()
+
+
+def analyze(labels, categories, correct, resamples=10000, permutations=10000, confidence=0.95, seed=0):
+    rng = np.random.default_rng(seed)
+    micro, macro, per_category = stratified_bootstrap(correct, categories, resamples, rng)
+    micro_ci, macro_ci = interval(micro, confidence), interval(macro, confidence)
+    cat_ci = {cat: interval(samples, confidence) for cat, samples in per_category.items()}
+
+    cats = sorted(per_category)
+    cat_acc = {cat: correct[:, categories == cat].mean(axis=1) for cat in cats}
+    models = {}
+    for m, label in enumerate(labels):
+        models[label] = {
+            "accuracy": float(correct[m].mean()),
+            "ci": micro_ci[:, m].tolist(),
+            "macro_accuracy": float(np.mean([cat_acc[cat][m] for cat in cats])),
+            "macro_ci": macro_ci[:, m].tolist(),
+            "per_category": {
+                cat: {
+                    "total": int(np.sum(categories == cat)),
+                    "accuracy": float(cat_acc[cat][m]),
+                    "ci": cat_ci[cat][:, m].tolist(),
+                }
+                for cat in cats
+            },
+        }
+
+    comparisons = []
+    for i in range(len(labels)):
+        for j in range(i + 1, len(labels)):
+            only_a = int(np.sum(correct[i] & ~correct[j]))
+            only_b = int(np.sum(~correct[i] & correct[j]))
+            comparisons.append({
+                "a": labels[i],
+                "b": labels[j],
+                "difference": float(correct[i].mean() - correct[j].mean()),
+                # same resamples for both models, so this is a paired interval
+                "difference_ci": interval(micro[:, i] - micro[:, j], confidence).tolist(),
+                "only_a_correct": only_a,
+                "only_b_correct": only_b,
+                "mcnemar_p": mcnemar_exact(only_a, only_b),
+                "permutation_p": permutation_test(correct[i], correct[j], permutations, rng),
+            })
+    for comparison, p in zip(comparisons, holm([c["mcnemar_p"] for c in comparisons])):
+        comparison["mcnemar_p_holm"] = p
+
+    return {
+        "items": int(correct.shape[1]),
+        "resamples": resamples,
+        "permutations": permutations,
+        "confidence": confidence,
+        "seed": seed,
+        "models": models,
+        "comparisons": comparisons,
+    }
+
+
+def leaderboard(report):
+    """Markdown tables: models by accuracy with intervals, then the pairwise tests."""
+    level = f"{report['confidence']:.0%}"
+    lines = [f"| Rank | Model | Accuracy ({level} CI) | Macro accuracy ({level} CI) |", "|---|---|---|---|"]
+    ranked = sorted(report["models"].items(), key=lambda kv: -kv[1]["accuracy"])
+    for rank, (label, stats) in enumerate(ranked, 1):
+        lines.append(f"| {rank} | {label} | {stats['accuracy']:.2%} [{stats['ci'][0]:.2%}, {stats['ci'][1]:.2%}] | "
+                     f"{stats['macro_accuracy']:.2%} [{stats['macro_ci'][0]:.2%}, {stats['macro_ci'][1]:.2%}] |")
+
+    lines += ["", f"| A | B | A - B ({level} CI) | McNemar p (Holm) | Permutation p |", "|---|---|---|---|---|"]
+    for c in report["comparisons"]:
+        lines.append(f"| {c['a']} | {c['b']} | {c['difference']:+.2%} "
+                     f"[{c['difference_ci'][0]:+.2%}, {c['difference_ci'][1]:+.2%}] | "
+                     f"{c['mcnemar_p']:.3g} ({c['mcnemar_p_holm']:.3g}) | {c['permutation_p']:.3g} |")
+    return "\n".join(lines)
+
+
+def main(args):
+    paths = sorted(p for pattern in args.result_files for p in glob.glob(pattern))
+    if not paths:
+        raise FileNotFoundError(f"No result files match {args.result_files}")
+    labels, keys, categories, correct = load_matrix(paths)
+
+    start = time.time()
+    report = analyze(labels, categories, correct, resamples=args.resamples, permutations=args.permutations,
+                     confidence=args.confidence, seed=args.seed)
+    elapsed = time.time() - start
+
+    table = leaderboard(report)
+    print(table)
+    print(f"\n{len(labels)} models x {len(keys)} items, {args.resamples} resamples, "
+          f"{args.permutations} permutations in {elapsed:.2f}s")
+
+    if args.report_path:
+        with open(args.report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.table_path:
+        with open(args.table_path, "w", encoding="utf-8") as f:
+            f.write(table + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bootstrap intervals and paired tests for evaluation results")
+    parser.add_argument("result_files", nargs="*", default=["results/out-*.json"],
+                        help="Result files or glob patterns")
+    parser.add_argument("--resamples", type=int, default=10000, help="Bootstrap resamples")
+    parser.add_argument("--permutations", type=int, default=10000, help="Sign flips per permutation test")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Interval confidence level")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--report_path", type=str, default=None, help="Write the full report as JSON")
+    parser.add_argument("--table_path", type=str, default=None, help="Write the leaderboard as Markdown")
+
+    main(parser.parse_args())
@@ -0,0 +1,68 @@
+import argparse
+import json
+import time
+
+from utils.clients import close_clients, configure_clients
+from utils.llm_helper import call_llm, import_provider
+from utils.metrics import percentiles
+from utils.stub_server import serve
+
+
+def fresh_client_call(model_name, api_key, prompt, base_url):
+    """The previous behaviour: a new SDK client (and connection) for every call."""
+    openai = import_provider("openai")
+    client = openai.OpenAI(api_key=api_key, base_url=base_url)
+    response = client.responses.create(model=model_name, input=[{"role": "user", "content": prompt}])
+    return response.output_text.strip()
+
+
+def latency_stats(fn, calls):
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        fn(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+    # same percentile definition as the run metrics of evaluation.py
+    stats = percentiles(latencies)
+    return {
+        "calls": calls,
+        "p50_ms": stats["p50"],
+        "p90_ms": stats["p90"],
+        "p99_ms": stats["p99"],
+        "mean_ms": stats["mean"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-call latency of fresh vs pooled provider clients")
+    parser.add_argument("--base_url", type=str, default=None,
+                        help="OpenAI-compatible endpoint; defaults to a local stub server")
+    parser.add_argument("--model_name", type=str, default="gpt-stub")
+    parser.add_argument("--api_key", type=str, default="stub-key")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output_file_path", type=str, help="Path to save results JSON")
+
+    args = parser.parse_args()
+    base_url = args.base_url
+    if base_url is None:
+        server, base_url = serve()
+    configure_clients(timeout=args.timeout)
+
+    prompt = "What is depicted in the above emoji art?"
+    results = {
+        "fresh": latency_stats(lambda i: fresh_client_call(args.model_name, args.api_key, prompt, base_url),
+                               args.calls),
+        "pooled": latency_stats(lambda i: call_llm(args.model_name, args.api_key, prompt, base_url=base_url),
+                                args.calls),
+    }
+    close_clients()
+
+    for name, stats in results.items():
+        print(f"{name:8s}: p50 {stats['p50_ms']:.2f} ms, p90 {stats['p90_ms']:.2f} ms, "
+              f"p99 {stats['p99_ms']:.2f} ms, mean {stats['mean_ms']:.2f} ms")
+    print(f"p50 speedup: {results['fresh']['p50_ms'] / results['pooled']['p50_ms']:.2f}x")
+
+    if args.output_file_path:
+        with open(args.output_file_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
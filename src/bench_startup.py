@@ -0,0 +1,76 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Run inside a fresh interpreter: everything evaluation.py does before its first request
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import evaluation
+from utils.load_dataset import EmojiDataset
+from utils.llm_helper import import_provider, provider_for
+data = EmojiDataset(sys.argv[2])
+data[0]
+import_provider(provider_for(sys.argv[1], image=sys.argv[3] == "image"))
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+rss_mb = rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+print(json.dumps({"import_seconds": time.perf_counter() - start, "peak_rss_mb": rss_mb}))
+"""
+
+
+def measure(model_name, test_file_path, mode):
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", PROBE, model_name, test_file_path, mode],
+        cwd=os.getcwd(), env={**os.environ, "PYTHONPATH": src_dir},
+        capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        return {"model": model_name, "error": proc.stderr.strip().splitlines()[-1]}
+    return {"model": model_name, "wall_seconds": wall, **json.loads(proc.stdout)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure evaluation startup time and peak memory per provider")
+    parser.add_argument("--model_names", type=str, nargs="+",
+                        default=["gpt-4o", "claude-haiku-4-5", "gemini-2.5-flash"])
+    parser.add_argument("--test_file_path", type=str, default="./data/test.jsonl")
+    parser.add_argument("--mode", type=str, default="text", choices=["text", "image"])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per model; the fastest is reported")
+    parser.add_argument("--max_seconds", type=float, help="Fail if startup wall time exceeds this")
+    parser.add_argument("--max_rss_mb", type=float, help="Fail if peak RSS exceeds this")
+    parser.add_argument("--output_file_path", type=str, help="Path to save results JSON")
+
+    args = parser.parse_args()
+
+    results = []
+    for model_name in args.model_names:
+        runs = [measure(model_name, args.test_file_path, args.mode) for _ in range(args.repeat)]
+        ok = [r for r in runs if "error" not in r]
+        results.append(min(ok, key=lambda r: r["wall_seconds"]) if ok else runs[0])
+
+    regressions = []
+    for r in results:
+        if "error" in r:
+            print(f"{r['model']:25s}: error - {r['error']}")
+            regressions.append(r["model"])
+            continue
+        print(f"{r['model']:25s}: wall {r['wall_seconds']:.2f}s, "
+              f"imports {r['import_seconds']:.2f}s, peak RSS {r['peak_rss_mb']:.0f} MB")
+        if args.max_seconds is not None and r["wall_seconds"] > args.max_seconds:
+            regressions.append(r["model"])
+        elif args.max_rss_mb is not None and r["peak_rss_mb"] > args.max_rss_mb:
+            regressions.append(r["model"])
+
+    if args.output_file_path:
+        with open(args.output_file_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if regressions:
+        print(f"\nStartup budget exceeded or failed for: {', '.join(regressions)}")
+        sys.exit(1)
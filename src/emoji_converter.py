@@ -1,42 +1,36 @@
+"""Convert emoji images into emoji-art grids.
+
+Run as a script to build emoji_data.jsonl from ./emojis/, or import it and
+stream records from any source of images, e.g.
+
+    emoji_name_map, _ = load_emoji_names("LIST_OF_EMOJI.txt")
+    images = iter_tar_images("serenity-emoji.tar")
+    for record in iter_records(images, emoji_name_map, get_curated_names()):
+        ...
+"""
+import argparse
+import hashlib
+import io
 import json
+import tarfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image 
 
 import numpy as np
 import os
-from skimage import color
-import emojis
+from utils.emoji_index import CACHE_DIR, load_emoji_index, parse_emoji_list, to_maps
+from utils.palette import PaletteQuantizer, palette
+from utils.color_memo import ColorMemo
 
 emoji_dir = "./emojis/"
 curated_names_file = "./curated_names.txt"
 emoji_list_file = "./emojis/LIST_OF_EMOJI.txt"
 output_file = "emoji_data.jsonl"
+manifest_file = "emoji_manifest.json"
 THRESHOLD = 30
 
-emoji_ascii_map = {
-    "🟥": '@',
-    "🟧": '%',
-    "🟨": '*',
-    "🟩": '+',
-    "🟦": '=',
-    "🟪": '-',
-    "⬛": ':',
-    "🟫": '#',
-    "⬜": '.' 
-}
-
-palette = {
-    "🟥": np.array([222, 37, 43, 255]), 
-    "🟧": np.array([255, 125, 41, 255]),
-    "🟨": np.array([253, 203, 50, 255]),
-    "🟩": np.array([59, 183, 95, 255]),
-    "🟦": np.array([47, 112, 205, 255]),
-    "🟪": np.array([151, 75, 181, 255]),
-    "⬛": np.array([44, 44, 46, 255]),
-    "🟫": np.array([121, 70, 45, 255]),
-    "⬜": np.array([242, 242, 243, 255])
-}
-
-FULL_SPACE = "　"
+quantizer = PaletteQuantizer(palette)
 
 def resize_with_padding(img, size=10):
     """Resize the image to fit inside size×size while preserving aspect ratio.
@@ -61,128 +55,114 @@ def resize_with_padding(img, size=10):
 
     return canvas
 
-def closest_emoji(color, palette):
-    diffs = [delta_e_distance(color, v) for v in palette.values()]
-    emojis = list(palette.keys())
-    return min(diffs), emojis[np.argmin(diffs)]
-
-def rgb_to_lab(rgb_color):
-    rgb = np.array(rgb_color[:3]).reshape(1, 1, 3) / 255.0
-    return color.rgb2lab(rgb)
-
-def delta_e_distance(color1, color2):
-
-    lab1 = rgb_to_lab(color1)
-    lab2 = rgb_to_lab(color2)
-    return color.deltaE_ciede2000(lab1, lab2)[0][0]
-
-def create_art(img, palette):
-
-    img = resize_with_padding(img, size=10)
-
-    colors = set()
-    arr = np.array(img)
-    emoji_grid = []
-    ascii_grid = []
-    diffs = []
-    for row in arr:
-        emoji_line = ""
-        ascii_line = ""
-        for pixel in row:
-            if pixel[3] < 128:
-                emoji_line += FULL_SPACE
-                ascii_line += FULL_SPACE
-            else:
-                diff, e = closest_emoji(pixel, palette)
-                diffs.append(diff)
-                emoji_line += e
-                ascii_line += emoji_ascii_map[e] * 2
-                colors.add(e)
-        emoji_grid.append(emoji_line)
-        ascii_grid.append(ascii_line)
-    avg_diff = np.mean(diffs)
-    return avg_diff, "\n".join(emoji_grid), "\n".join(ascii_grid), colors
-
-def get_emoji_safe(ch):
-    e = emojis.db.get_emoji_by_code(ch)
-    if e is None and not ch.endswith("\ufe0f"):
-        e = emojis.db.get_emoji_by_code(ch + "\ufe0f")
-    return e
+def create_art(img, quantizer, size=10):
+    return create_arts(img, quantizer, [size])[size]
+
+def create_arts(img, quantizer, sizes):
+    """Build the art for several grid sizes from one decoded image.
+
+    All sizes are quantized together in a single call; returns a dict of
+    size -> (avg_diff, emoji_art, ascii_art, colors)."""
+
+    pixels = [np.array(resize_with_padding(img, size=size)).reshape(-1, 4) for size in sizes]
+    grid, diffs = quantizer.quantize(np.concatenate(pixels)[:, None, :])
+    grid = grid.ravel()
+
+    arts = {}
+    start = diff_start = 0
+    for size in sizes:
+        g = grid[start:start + size * size].reshape(size, size)
+        n_opaque = int(np.count_nonzero(g != quantizer.transparent))
+        avg_diff = np.mean(diffs[diff_start:diff_start + n_opaque])
+        emoji_art = quantizer.render_emoji(g)
+        ascii_art = quantizer.render_ascii(g)
+        arts[size] = (avg_diff, emoji_art, ascii_art, quantizer.colors(g))
+        start += size * size
+        diff_start += n_opaque
+    return arts
 
 # set of names that avoid gender specific or duplicate emojis
-def get_curated_names():
-    with open(curated_names_file, "r") as f:
+def get_curated_names(path=curated_names_file):
+    with open(path, "r") as f:
         names = set(line.strip() for line in f)
 
     return names
 
-def load_emoji_names(list_file):
-    """Load emoji names from the LIST_OF_EMOJI.txt file"""
-    emoji_map = {}
-    cat_map = {}
-    with open(list_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line or ' - ' not in line:
-                continue
-            
-            parts = line.split(' - ')
-            if len(parts) >= 3:
-                emoji_char = parts[0].strip()
-                emoji_name = parts[1].strip()
-                filename = parts[2].strip()
-                emoji_obj = get_emoji_safe(emoji_char)
-
-                if emoji_obj:
-                    emoji_cat = emoji_obj.category
-                    unicode_code = filename.replace('.png', '')
-                    emoji_map[unicode_code] = (emoji_name, emoji_char, emoji_cat)
-                    if emoji_cat not in cat_map:
-                        cat_map[emoji_cat] = [emoji_name]
-                    else:
-                        cat_map[emoji_cat].append(emoji_name)
-
-    return emoji_map, cat_map
-
-# Load the emoji name mapping
-print("Loading emoji names...")
-emoji_name_map, cat_map = load_emoji_names(emoji_list_file)
-print(f"Loaded {len(emoji_name_map)} emoji names")
-
-# load curated names
-curated_names = get_curated_names()
-
-# Process all emojis and write to JSONL
-successful = 0
-failed = 0
-missing_names = 0
-
-with open(output_file, 'w', encoding='utf-8') as f:
-    for fname in sorted(os.listdir(emoji_dir)):
-        if not fname.endswith(".png"):
-            continue
-        
-        try:
-            path = os.path.join(emoji_dir, fname)
-            img = Image.open(path).convert("RGBA")
-            
-            unicode_code = fname[:-4]  # Remove .png
-            emoji_name, emoji_char, emoji_cat = emoji_name_map.get(unicode_code)
-
-            if emoji_name not in curated_names:
-                continue
-            
-            if not emoji_name:
-                missing_names += 1
-                print(f"⚠ Missing name for: {unicode_code}")
-                emoji_name = f"emoji {unicode_code}"
-            
-            avg_diff, emoji_art, ascii_art, colors = create_art(img, palette)
-            if avg_diff > THRESHOLD:
-                raise Exception("Color difference exceeded threshold")
-            
-            # Create training example in chat format
-            training_example = {
+def load_emoji_names(list_file, cache_dir=CACHE_DIR):
+    """Load emoji names from the LIST_OF_EMOJI.txt file (a path or an open text file).
+
+    Paths go through the persisted metadata index in utils.emoji_index."""
+    if hasattr(list_file, "read"):
+        with list_file:
+            return to_maps(parse_emoji_list(list_file))
+    return load_emoji_index(list_file, cache_dir=cache_dir)
+
+def settings_key(threshold):
+    """Conversion settings recorded in the manifest; changing them invalidates it."""
+    return {
+        "palette": {e: [int(c) for c in v] for e, v in palette.items()},
+        "threshold": threshold,
+    }
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {"settings": None, "entries": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def write_atomic(path, text):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def use_color_memo(enabled):
+    """Attach a memo of nearest palette colors to the module quantizer (one per process)."""
+    if enabled:
+        quantizer.color_memo = ColorMemo(quantizer)
+
+def open_image(source):
+    """Open an image given as a path, raw bytes, a binary file object or a PIL image."""
+    if isinstance(source, Image.Image):
+        return source.convert("RGBA")
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    return Image.open(source).convert("RGBA")
+
+def iter_dir_images(directory):
+    """Yield (filename, path) for every PNG in a directory, in sorted order."""
+    for fname in sorted(os.listdir(directory)):
+        if fname.endswith(".png"):
+            yield fname, os.path.join(directory, fname)
+
+def iter_tar_images(tar_path):
+    """Yield (filename, bytes) for every PNG in a (possibly compressed) tarball.
+
+    The archive is read as a stream, one member at a time."""
+    with tarfile.open(tar_path, "r|*") as tar:
+        for member in tar:
+            fname = os.path.basename(member.name)
+            if member.isfile() and fname.endswith(".png"):
+                yield fname, tar.extractfile(member).read()
+
+def convert_image(job):
+    """Decode one image and convert it at every requested size. Runs inside the worker processes."""
+    source, unicode_code, emoji_name, emoji_cat, sizes = job
+    try:
+        img = open_image(source)
+        arts = create_arts(img, quantizer, sizes)
+    except Exception as e:
+        return {"error": str(e)}
+
+    converted = {}
+    for size, (avg_diff, emoji_art, ascii_art, colors) in arts.items():
+        converted[str(size)] = {
+            "avg_diff": float(avg_diff),
+            "record": {
                 "name": emoji_name,
                 "unicode": unicode_code,
                 "category": emoji_cat,
@@ -190,18 +170,182 @@ with open(output_file, 'w', encoding='utf-8') as f:
                 "colors": list(colors),
                 "ascii_art": ascii_art
             }
+        }
+    return {"sizes": converted}
+
+def imap_ordered(fn, jobs, workers=1, window=None, initializer=None, initargs=()):
+    """Lazily map fn over (key, job) pairs, yielding (key, result) in input order.
+
+    With several workers, at most `window` jobs are in flight so memory stays
+    bounded however long the input is."""
+    if workers <= 1:
+        for key, job in jobs:
+            yield key, fn(job)
+        return
+
+    window = window or workers * 4
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        for key, job in jobs:
+            pending.append((key, pool.submit(fn, job)))
+            if len(pending) >= window:
+                key, future = pending.popleft()
+                yield key, future.result()
+        while pending:
+            key, future = pending.popleft()
+            yield key, future.result()
+
+def iter_records(images, emoji_name_map, curated_names=None, size=10, threshold=THRESHOLD,
+                 workers=1, memo_colors=False):
+    """Convert images lazily and yield one dataset record per image.
+
+    `images` is any iterable of paths or of (filename, source) pairs, where
+    source is anything open_image() accepts. Images whose name is unknown or
+    not curated are skipped before they are decoded; failed conversions and
+    those above the color threshold are skipped as well."""
 
-            f.write(json.dumps(training_example, ensure_ascii=False) + '\n')
-            
-            successful += 1
-            print(f"✓ Processed: {unicode_code} - {emoji_name}")
-            
-        except Exception as e:
+    def jobs():
+        for item in images:
+            fname, source = (os.path.basename(item), item) if isinstance(item, (str, os.PathLike)) else item
+            unicode_code = os.path.basename(fname)[:-4]  # Remove .png
+            if unicode_code not in emoji_name_map:
+                continue
+            emoji_name, emoji_char, emoji_cat = emoji_name_map[unicode_code]
+            if curated_names is not None and emoji_name not in curated_names:
+                continue
+            yield fname, (source, unicode_code, emoji_name, emoji_cat, [size])
+
+    use_color_memo(memo_colors)
+    for fname, result in imap_ordered(convert_image, jobs(), workers, initializer=use_color_memo,
+                                      initargs=(memo_colors,)):
+        if "error" in result:
+            continue
+        converted = result["sizes"][str(size)]
+        if converted["avg_diff"] <= threshold:
+            yield converted["record"]
+
+def output_path(output_file, size, sizes):
+    """One JSONL per grid size; a single-size run writes output_file as is."""
+    if len(sizes) == 1:
+        return output_file
+    root, ext = os.path.splitext(output_file)
+    return f"{root}_{size}x{size}{ext}"
+
+def main(args):
+    # Load the emoji name mapping
+    print("Loading emoji names...")
+    emoji_name_map, cat_map = load_emoji_names(args.emoji_list_file, cache_dir=args.cache_dir)
+    print(f"Loaded {len(emoji_name_map)} emoji names")
+
+    # load curated names
+    curated_names = get_curated_names()
+
+    use_color_memo(not args.no_color_memo)
+
+    manifest = load_manifest(args.manifest_path)
+    # the threshold is applied when writing, so changing it never forces a reconversion
+    settings = settings_key(args.threshold)
+    same_settings = (
+        not args.force
+        and manifest["settings"] is not None
+        and {**manifest["settings"], "threshold": args.threshold} == settings
+    )
+    cached = manifest["entries"] if same_settings else {}
+
+    successful = 0
+    failed = 0
+    reused = 0
+    entries = {}
+    jobs = []
+
+    # Filter on names before anything is decoded
+    for fname, path in iter_dir_images(args.emoji_dir):
+        unicode_code = fname[:-4]  # Remove .png
+        if unicode_code not in emoji_name_map:
+            failed += 1
+            print(f"✗ Failed: {fname} - no entry in {args.emoji_list_file}")
+            continue
+
+        emoji_name, emoji_char, emoji_cat = emoji_name_map[unicode_code]
+        if emoji_name not in curated_names:
+            continue
+
+        digest = file_hash(path)
+        entry = cached.get(fname)
+        if entry is not None and entry["hash"] == digest and (
+            "error" in entry or all(str(size) in entry["sizes"] for size in args.sizes)
+        ):
+            entries[fname] = entry
+            reused += 1
+        else:
+            # sizes converted by earlier runs stay in the manifest
+            kept = entry["sizes"] if entry is not None and entry["hash"] == digest else {}
+            entries[fname] = {"hash": digest, "sizes": dict(kept)}
+            missing = [size for size in args.sizes if str(size) not in kept]
+            jobs.append((fname, (path, unicode_code, emoji_name, emoji_cat, missing)))
+
+    # Fan conversion out across worker processes
+    workers = args.workers if len(jobs) > 1 else 1
+    converted = imap_ordered(convert_image, jobs, workers, initializer=use_color_memo,
+                             initargs=(not args.no_color_memo,))
+    for fname, result in converted:
+        if "error" in result:
+            entries[fname] = {"hash": entries[fname]["hash"], "error": result["error"]}
+        else:
+            entries[fname]["sizes"].update(result["sizes"])
+            record = next(iter(result["sizes"].values()))["record"]
+            print(f"✓ Processed: {record['unicode']} - {record['name']}")
+
+    for fname in sorted(entries):
+        if "error" in entries[fname]:
             failed += 1
-            print(f"✗ Failed: {fname} - {str(e)}")
+            print(f"✗ Failed: {fname} - {entries[fname]['error']}")
+
+    # Write records in sorted filename order, one file per size
+    for size in args.sizes:
+        lines = []
+        for fname in sorted(entries):
+            entry = entries[fname]
+            if "error" in entry:
+                continue
+            elif entry["sizes"][str(size)]["avg_diff"] > args.threshold:
+                failed += 1
+                print(f"✗ Failed: {fname} ({size}x{size}) - Color difference exceeded threshold")
+            else:
+                lines.append(json.dumps(entry["sizes"][str(size)]["record"], ensure_ascii=False) + '\n')
+                successful += 1
+
+        path = output_path(args.output_file, size, args.sizes)
+        write_atomic(path, "".join(lines))
+        print(f"Training data saved to: {path}")
+
+    write_atomic(args.manifest_path, json.dumps({"settings": settings, "entries": entries}, ensure_ascii=False))
+
+    print(f"\nProcessing complete!")
+    print(f"Successful: {successful}")
+    print(f"Failed: {failed}")
+    print(f"Converted: {len(jobs)}")
+    print(f"Reused from manifest: {reused}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert emoji images into emoji-art grids")
+    parser.add_argument("--emoji_dir", type=str, default=emoji_dir)
+    parser.add_argument("--emoji_list_file", type=str, default=emoji_list_file)
+    parser.add_argument("--output_file", type=str, default=output_file)
+    parser.add_argument("--manifest_path", type=str, default=manifest_file,
+                        help="Manifest of image hashes used to skip unchanged images")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10],
+                        help="Grid sizes to generate, e.g. --sizes 10 16 24 32")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="Maximum average color difference allowed")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Number of worker processes")
+    parser.add_argument("--no_color_memo", action="store_true",
+                        help="Compute every pixel's nearest palette color directly instead of memoizing "
+                             "distinct colors (results are identical either way)")
+    parser.add_argument("--cache_dir", type=str, default=CACHE_DIR)
+    parser.add_argument("--force", action="store_true", help="Ignore the manifest and reconvert everything")
 
-print(f"\nProcessing complete!")
-print(f"Successful: {successful}")
-print(f"Failed: {failed}")
-print(f"Missing names: {missing_names}")
-print(f"Training data saved to: {output_file}")
\ No newline at end of file
+    args = parser.parse_args()
+    main(args)
@@ -1,19 +1,30 @@
 import argparse
-from utils.prompts import TEXT_ONLY_PROMPT, IMAGE_ONLY_PROMPT
+import asyncio
+from utils.prompts import TEXT_ONLY_PROMPT, IMAGE_ONLY_PROMPT, PACKED_PROMPT, PACKED_QUESTION
 from utils.load_dataset import EmojiDataset
-from torch.utils.data import DataLoader
 from tqdm import tqdm
-from utils.llm_helper import call_llm
+from utils.llm_helper import acall_llm, astream_llm, call_llm, image_bytes, request_params, stream_llm
+from utils.response_cache import CacheMiss, ResponseCache, request_key
+from utils.journal import ResultJournal, finished_keys, latest_results, result_key
+from utils.clients import aclose_clients, close_clients, configure_clients
+from utils.metrics import CallMetrics, write_prometheus
+from utils.async_engine import ProviderLimits, RetryPolicy, estimate_tokens, run_ordered
+from utils.batch import batch_id, make_backend, run_batches
 from collections import defaultdict
-from utils.post_processing import postprocess_answer
+from utils.post_processing import has_final_answer, parse_packed_answers, postprocess_answer
+import functools
 import json
 
-def main(args):
+def load_slice(args):
     test_data = EmojiDataset(data_path=args.test_file_path)
+    return select_slice(test_data, args.category, args.start_idx, args.end_idx)
+
+def select_slice(test_data, category=None, start=0, end=None):
+    if category:
+        test_data = test_data.filter(category=category)
 
     # Handle slicing for partial runs
-    start = args.start_idx
-    end = args.end_idx if args.end_idx is not None else len(test_data)
+    end = end if end is not None else len(test_data)
 
     # Guard against invalid ranges
     if start < 0 or start >= len(test_data):
@@ -22,151 +33,595 @@ def main(args):
         raise ValueError(f"Invalid end_idx {end}")
 
     # Slice the dataset
-    test_data = test_data[start:end]
-
-    test_dataloader = DataLoader(test_data, shuffle=False, batch_size=1)
-    
-    # Track overall statistics
-    total_correct = 0
-    total_questions = 0
-    
-    # Track per-category statistics
-    category_correct = defaultdict(int)
-    category_total = defaultdict(int)
-    
-    # Store results for output file
+    return test_data[start:end]
+
+@functools.lru_cache(maxsize=None)
+def image_source(source, archive_path=None, scale=None):
+    """Where image mode gets its pictures: the emoji PNGs, grids rendered on
+    demand, or a prebuilt archive (see render_images.py)."""
+    if source == "file":
+        return None
+    # imported lazily: rendering pulls in the palette/skimage stack
+    from utils.render import GridImages, ImageArchive
+    if source == "render":
+        return GridImages(scale=scale)
+    if source == "archive":
+        return ImageArchive(archive_path)
+    raise ValueError(f"Invalid image source: {source}")
+
+def images_for(args):
+    return image_source(args.image_source, args.image_archive, args.image_scale)
+
+def grid_size(data):
+    """Side length of an item's grid, in cells."""
+    return len(data["emoji_art"].splitlines())
+
+def build_prompt(data, mode, images=None):
+    """Prompt text and optional image (file path or data URL) for one dataset item."""
+    if mode == "text":
+        prompt = TEXT_ONLY_PROMPT.format(emoji_art=data["emoji_art"], choices=data["choices"],
+                                         size=grid_size(data))
+        return prompt, None
+    if mode == "image":
+        prompt = IMAGE_ONLY_PROMPT.format(choices=data["choices"], size=grid_size(data))
+        if images is not None:
+            return prompt, images.image_for(data)
+        return prompt, f"emojis/{data['unicode']}.png"
+    raise ValueError(f"Invalid mode: {mode}")
+
+def with_variant(result, data):
+    if data.get("variant") is not None:
+        result["variant"] = data["variant"]
+    return result
+
+def score_response(data, response, usage=None):
+    # Check if answer is correct
+    is_correct = postprocess_answer(
+        response,
+        data["labels"],
+        data["ori_choices"]
+    )
+    return with_variant({
+        "unicode": data["unicode"],
+        "name": data.get("name", ""),
+        "category": data["category"],
+        "response": response,
+        "correct": bool(is_correct),
+        "target": data["labels"],
+        # of the call that produced the response (an earlier one for cache hits)
+        **usage_fields(usage),
+    }, data)
+
+def usage_fields(usage):
+    if not isinstance(usage, dict):
+        return {}
+    return {key: usage[key] for key in ("latency", "input_tokens", "output_tokens") if usage.get(key) is not None}
+
+def error_result(data, e):
+    print(f"Error processing {data.get('unicode', 'unknown')}: {e}")
+    return with_variant({
+        "unicode": data["unicode"],
+        "name": data.get("name", ""),
+        "category": data["category"],
+        "error": str(e),
+        "correct": False
+    }, data)
+
+def cache_key(args, prompt, image_path, early_stop=False):
+    image = image_bytes(image_path) if image_path else None
+    params = request_params(args.model_name, image=bool(image_path))
+    if early_stop:
+        # truncated at the answer, not interchangeable with a full response
+        params["stop"] = "final_answer"
+    return request_key(args.model_name, prompt, image, params)
+
+def open_cache(args):
+    if not args.cache_path:
+        return None
+    max_bytes = args.cache_max_mb * 2**20 if args.cache_max_mb else None
+    max_age = args.cache_max_age_days * 86400 if args.cache_max_age_days else None
+    return ResponseCache(args.cache_path, mode=args.cache_mode, max_bytes=max_bytes, max_age=max_age)
+
+def answer_stop(args):
+    """Early-termination check for streamed single-question responses."""
+    if args.stream and not args.keep_reasoning:
+        return has_final_answer
+    return None
+
+def fetch(args, prompt, image_path, retry, cache=None, metrics=None, stop=None):
+    """(response text, usage) for one prompt, through the cache when one is open.
+
+    With --stream the response is streamed and, if `stop` is given, cut off
+    once stop(text) is true. Every API call (not cache hits) is recorded in
+    metrics."""
+    attempts = 0
+
+    def attempt():
+        nonlocal attempts
+        attempts += 1
+        if args.stream:
+            return stream_llm(args.model_name, args.api_key, prompt, image_path,
+                              base_url=args.base_url, stop=stop)
+        return call_llm(args.model_name, args.api_key, prompt, image_path, base_url=args.base_url)
+
+    def call():
+        try:
+            response = retry.call(attempt)
+        except Exception as e:
+            if metrics is not None:
+                metrics.record(retries=attempts - 1, error=e)
+            raise
+        if metrics is not None:
+            metrics.record(response[1], retries=attempts - 1)
+        return response
+
+    if cache is None:
+        return call()
+    return tuple(cache.call(cache_key(args, prompt, image_path, stop is not None), args.model_name, call))
+
+async def afetch(args, prompt, image_path, limits, retry, cache=None, metrics=None, stop=None):
+    """Async counterpart of fetch, under the provider's rate limits."""
+    attempts = 0
+
+    async def attempt():
+        nonlocal attempts
+        attempts += 1
+        # each attempt, retries included, counts against the budget
+        async with limits:
+            await limits.wait(estimate_tokens(prompt))
+            if args.stream:
+                return await astream_llm(args.model_name, args.api_key, prompt, image_path,
+                                         base_url=args.base_url, stop=stop)
+            return await acall_llm(args.model_name, args.api_key, prompt, image_path,
+                                   base_url=args.base_url)
+
+    async def call():
+        try:
+            response = await retry.acall(attempt)
+        except Exception as e:
+            if metrics is not None:
+                metrics.record(retries=attempts - 1, error=e)
+            raise
+        if metrics is not None:
+            metrics.record(response[1], retries=attempts - 1)
+        return response
+
+    if cache is None:
+        return await call()
+    return tuple(await cache.acall(cache_key(args, prompt, image_path, stop is not None),
+                                   args.model_name, call))
+
+def evaluate_item(args, data, retry, cache=None, metrics=None):
+    prompt, image_path = build_prompt(data, args.mode, images_for(args))
+    try:
+        response, usage = fetch(args, prompt, image_path, retry, cache, metrics, answer_stop(args))
+        result = score_response(data, response, usage)
+        print(response)
+        return result
+    except Exception as e:
+        return error_result(data, e)
+
+async def evaluate_items_async(args, test_data, limits, retry, cache=None, on_result=None, metrics=None):
+    """Evaluate items concurrently under `limits`, which may be shared with other runs."""
+    async def worker(i, data):
+        prompt, image_path = build_prompt(data, args.mode, images_for(args))
+        try:
+            response, usage = await afetch(args, prompt, image_path, limits, retry, cache, metrics,
+                                           answer_stop(args))
+            return score_response(data, response, usage)
+        except Exception as e:
+            return error_result(data, e)
+
+    def done(i, result):
+        if on_result:
+            on_result(result)
+
+    return await run_ordered(test_data, worker, on_done=done)
+
+async def evaluate_all_async(args, test_data, retry, cache=None, on_result=None, metrics=None):
+    """Evaluate every item concurrently under the provider's rate limits."""
+    limits = ProviderLimits(args.concurrency, rpm=args.rpm, tpm=args.tpm)
+    progress = tqdm(total=len(test_data))
+
+    def done(result):
+        progress.update()
+        if on_result:
+            on_result(result)
+
+    try:
+        return await evaluate_items_async(args, test_data, limits, retry, cache, done, metrics)
+    finally:
+        progress.close()
+        await aclose_clients()
+
+def evaluate_batch(args, test_data, cache=None, on_result=None):
+    """Evaluate through the provider's batch API; cached responses are not resubmitted."""
+    prompts = [build_prompt(data, args.mode, images_for(args)) for data in test_data]
+    keys = [cache_key(args, *p) for p in prompts]
+    # IDs derive from the request content (prompt, image, model, params), so a
+    # resumed run finds its submitted requests and a changed dataset never does
+    custom_ids = [batch_id(key) for key in keys]
+
+    responses = {}
+    if cache is not None:
+        for cid, key in zip(custom_ids, keys):
+            try:
+                hit = cache.lookup(key)
+            except CacheMiss as e:
+                hit = None
+                responses[cid] = e
+            if hit is not None:
+                responses[cid] = hit[0]
+    # identical prompts share one request
+    requests = list({cid: (cid, *p) for cid, p in zip(custom_ids, prompts) if cid not in responses}.values())
+
+    if requests:
+        backend = make_backend(args.model_name, args.api_key, args.base_url,
+                               image=args.mode == "image", fake_dir=args.batch_dir)
+        fetched = run_batches(backend, requests, state_path=batch_state_path(args),
+                              run=f"{args.model_name}/{args.mode}", resume=args.resume,
+                              poll_interval=args.poll_interval)
+        for cid, key in zip(custom_ids, keys):
+            response = fetched.get(cid)
+            if cache is not None and isinstance(response, str):
+                cache.put(key, args.model_name, [response, None])
+        responses.update(fetched)
+
     results = []
-    
-    for data in tqdm(test_dataloader):
-        emoji_art = data["emoji_art"][0]
-        choices = data["choices"][0]
-        category = data["category"][0]
-        target_label = data["labels"][0]
-        
-        # Prepare prompt based on mode
-        if args.mode == "text":
-            prompt = TEXT_ONLY_PROMPT.format(emoji_art=emoji_art, choices=choices)
-            image_path = None
-        elif args.mode == "image":
-            prompt = IMAGE_ONLY_PROMPT.format(choices=choices)
-            image_path = f"emojis/{data['unicode'][0]}.png"
+    for cid, data in zip(custom_ids, test_data):
+        response = responses[cid]
+        if isinstance(response, Exception):
+            results.append(error_result(data, response))
         else:
-            raise ValueError(f"Invalid mode: {args.mode}")
-        
+            results.append(score_response(data, response))
+        if on_result:
+            on_result(results[-1])
+    return results
+
+def evaluate_all(args, test_data, retry, cache=None, on_result=None, metrics=None):
+    if args.batch:
+        return evaluate_batch(args, test_data, cache, on_result)
+    if args.concurrency > 1:
+        return asyncio.run(evaluate_all_async(args, test_data, retry, cache, on_result, metrics))
+
+    results = []
+    try:
+        for data in tqdm(test_data):
+            results.append(evaluate_item(args, data, retry, cache, metrics))
+            if on_result:
+                on_result(results[-1])
+    finally:
+        close_clients()
+    return results
+
+def build_packed_prompt(group):
+    """One prompt asking every question of the group in numbered sections."""
+    questions = "\n\n".join(
+        PACKED_QUESTION.format(number=n, size=grid_size(data),
+                               emoji_art=data["emoji_art"], choices=data["choices"])
+        for n, data in enumerate(group, 1)
+    )
+    return PACKED_PROMPT.format(count=len(group), questions=questions)
+
+async def fetch_groups_async(args, groups, retry, cache=None, metrics=None):
+    limits = ProviderLimits(args.concurrency, rpm=args.rpm, tpm=args.tpm)
+
+    async def worker(i, group):
         try:
-            response, _ = call_llm(args.model_name, args.api_key, prompt, image_path)
-            # Check if answer is correct
-            is_correct = postprocess_answer(
-                response, 
-                target_label, 
-                data["ori_choices"][0]
-            )
-
-            print(response)
-
-            # Update counts
-            total_questions += 1
-            category_total[category] += 1
-            
-            if is_correct:
-                total_correct += 1
-                category_correct[category] += 1
-            
-            # Store result
-            results.append({
-                "unicode": data["unicode"][0],
-                "name": data.get("name", [""])[0],
-                "category": category,
-                "response": response,
-                "correct": bool(is_correct),
-                "target": target_label
-            })
-            
+            response, _ = await afetch(args, build_packed_prompt(group), None, limits, retry, cache, metrics)
+            return response
         except Exception as e:
-            print(f"Error processing {data.get('unicode', ['unknown'])[0]}: {e}")
-            total_questions += 1
-            category_total[category] += 1
-            results.append({
-                "unicode": data["unicode"][0],
-                "name": data.get("name", [""])[0],
-                "category": category,
-                "error": str(e),
-                "correct": False
-            })
-    
+            return e
+
+    try:
+        return await run_ordered(groups, worker)
+    finally:
+        await aclose_clients()
+
+def fetch_groups(args, groups, retry, cache=None, metrics=None):
+    """Response text (or the exception raised) for every packed group."""
+    if args.concurrency > 1:
+        return asyncio.run(fetch_groups_async(args, groups, retry, cache, metrics))
+
+    responses = []
+    try:
+        for group in tqdm(groups):
+            try:
+                responses.append(fetch(args, build_packed_prompt(group), None, retry, cache, metrics)[0])
+            except Exception as e:
+                responses.append(e)
+    finally:
+        close_clients()
+    return responses
+
+def evaluate_packed(args, test_data, retry, cache=None, on_result=None, metrics=None):
+    """Ask args.pack questions per request; unanswered questions are re-run unpacked.
+
+    Results answered from a packed prompt are marked with "packed": True and
+    keep the raw group response and their number in it, for re-parsing later."""
+    test_data = list(test_data)
+    groups = [test_data[i:i + args.pack] for i in range(0, len(test_data), args.pack)]
+
+    results, unanswered = [], []
+    for group, response in zip(groups, fetch_groups(args, groups, retry, cache, metrics)):
+        if isinstance(response, Exception):
+            print(f"Error processing packed group of {len(group)}: {response}")
+            unanswered.extend(group)
+            continue
+        answers = parse_packed_answers(response, len(group))
+        for n, data in enumerate(group, 1):
+            if n not in answers:
+                unanswered.append(data)
+                continue
+            result = score_response(data, answers[n])
+            result["packed"] = True
+            result["packed_number"] = n
+            result["packed_response"] = response
+            results.append(result)
+            if on_result:
+                on_result(result)
+
+    if unanswered:
+        print(f"Re-running {len(unanswered)} unanswered questions unpacked")
+        results.extend(evaluate_all(args, unanswered, retry, cache, on_result, metrics))
+
+    order = {result_key(data): i for i, data in enumerate(test_data)}
+    return sorted(results, key=lambda r: order[result_key(r)])
+
+def summarize(results):
+    """Overall and per-category accuracy for a list of per-item results."""
+    # Track per-category statistics
+    category_correct = defaultdict(int)
+    category_total = defaultdict(int)
+    for result in results:
+        category_total[result["category"]] += 1
+        if result["correct"]:
+            category_correct[result["category"]] += 1
+
+    total_questions = len(results)
+    total_correct = sum(category_correct.values())
+
     # Calculate overall accuracy
     overall_accuracy = total_correct / total_questions if total_questions > 0 else 0
-    
+
     # Calculate per-category accuracy
-    category_accuracy = {}
-    for category in category_total:
-        category_accuracy[category] = (
-            category_correct[category] / category_total[category] 
-            if category_total[category] > 0 else 0
-        )
-    
+    per_category = {
+        category: {
+            "total": category_total[category],
+            "correct": category_correct[category],
+            "accuracy": category_correct[category] / category_total[category]
+        }
+        for category in category_total
+    }
+
     # Macro accuracy
-    if len(category_accuracy) > 0:
-        macro_acc = sum(category_accuracy.values()) / len(category_accuracy)
+    if len(per_category) > 0:
+        macro_acc = sum(c["accuracy"] for c in per_category.values()) / len(per_category)
     else:
         macro_acc = 0
 
+    return {
+        "overall": {
+            "total": total_questions,
+            "correct": total_correct,
+            "accuracy": overall_accuracy
+        },
+        "per_category": per_category,
+        "macro_accuracy": macro_acc
+    }
+
+def summarize_packing(results):
+    """Accuracy of packed answers and of the questions re-run unpacked, kept apart."""
+    return {
+        "packed": summarize([r for r in results if r.get("packed")])["overall"],
+        "unpacked": summarize([r for r in results if not r.get("packed")])["overall"],
+    }
+
+def print_summary(summary):
+    overall = summary["overall"]
+
     # Print results
     print("\n" + "="*60)
     print("OVERALL RESULTS")
     print("="*60)
-    print(f"Total Questions: {total_questions}")
-    print(f"Correct: {total_correct}")
-    print(f"Overall Micro Accuracy: {overall_accuracy:.2%}")
-    print(f"Overall Macro Accuracy: {macro_acc:.2%}")
-    
+    print(f"Total Questions: {overall['total']}")
+    print(f"Correct: {overall['correct']}")
+    print(f"Overall Micro Accuracy: {overall['accuracy']:.2%}")
+    print(f"Overall Macro Accuracy: {summary['macro_accuracy']:.2%}")
+
     print("\n" + "="*60)
     print("PER-CATEGORY RESULTS")
     print("="*60)
-    for category in sorted(category_accuracy.keys()):
-        correct = category_correct[category]
-        total = category_total[category]
-        accuracy = category_accuracy[category]
-        print(f"{category:30s}: {correct:3d}/{total:3d} = {accuracy:.2%}")
-    
+    for category in sorted(summary["per_category"].keys()):
+        stats = summary["per_category"][category]
+        print(f"{category:30s}: {stats['correct']:3d}/{stats['total']:3d} = {stats['accuracy']:.2%}")
+
+    if "packing" in summary:
+        print("\n" + "="*60)
+        print("PACKED VS UNPACKED")
+        print("="*60)
+        for kind, stats in summary["packing"].items():
+            print(f"{kind:30s}: {stats['correct']:3d}/{stats['total']:3d} = {stats['accuracy']:.2%}")
+
+    metrics = summary.get("metrics")
+    if metrics and metrics["requests"]:
+        print("\n" + "="*60)
+        print("API CALLS")
+        print("="*60)
+        print(f"Requests: {metrics['requests']} ({metrics['errors']} failed, {metrics['retries']} retries, "
+              f"{metrics['stopped_early']} stopped early), {metrics['requests_per_second']:.2f} req/s")
+        for name in ("latency", "ttft"):
+            stats = metrics[name]
+            if stats:
+                print(f"{name.upper():8s} p50 {stats['p50']:.3f}s  p90 {stats['p90']:.3f}s  p99 {stats['p99']:.3f}s")
+        print(f"Tokens: {metrics['input_tokens']} in, {metrics['output_tokens']} out, "
+              f"{metrics['output_tokens_per_second']:.1f} out tok/s")
+
+def save_results(path, model_name, mode, summary, results, extras=("packing", "metrics")):
+    output_data = {
+        "model": model_name,
+        "mode": mode,
+        "overall": summary["overall"],
+        "per_category": summary["per_category"],
+        "detailed_results": results
+    }
+    for extra in extras:
+        if extra in summary:
+            output_data[extra] = summary[extra]
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(output_data, f, indent=2, ensure_ascii=False)
+
+    print(f"\nDetailed results saved to: {path}")
+
+def ingest_results(db_path, path):
+    """Add a saved results file to the results store, replacing an earlier run of the same name."""
+    from utils.results_store import ResultsStore
+    store = ResultsStore(db_path)
+    try:
+        store.ingest(path, replace=True)
+    finally:
+        store.close()
+    print(f"Results stored in: {db_path}")
+
+def journal_path(args):
+    if args.journal_path:
+        return args.journal_path
+    if args.output_file_path:
+        return args.output_file_path + ".journal.jsonl"
+    return None
+
+def batch_state_path(args):
+    if args.batch_state_path:
+        return args.batch_state_path
+    if args.output_file_path:
+        return args.output_file_path + ".batch.json"
+    return None
+
+def main(args):
+    test_data = load_slice(args)
+    retry = RetryPolicy(max_retries=args.max_retries)
+    configure_clients(max_connections=args.max_connections, timeout=args.timeout)
+    cache = open_cache(args)
+
+    # Every result is journaled as soon as it completes; --resume skips
+    # items that already have a journaled result, except failed ones
+    path = journal_path(args)
+    done = set()
+    if path and args.resume:
+        done = finished_keys(path)
+        print(f"Resuming: {len(done)} results already in {path}")
+    items = list(test_data)
+    keys = [result_key(data) for data in items]
+    pending = [data for data, key in zip(items, keys) if key not in done]
+
+    journal = ResultJournal(path, resume=args.resume) if path else None
+    metrics = CallMetrics()
+    evaluate = evaluate_packed if args.pack > 1 else evaluate_all
+    try:
+        results = evaluate(args, pending, retry, cache, journal.append if journal else None, metrics)
+    except KeyboardInterrupt:
+        if journal is None:
+            raise
+        print("\nInterrupted; summarizing the results journaled so far")
+    finally:
+        if journal is not None:
+            journal.close()
+        if cache is not None:
+            print(f"Response cache: {cache.hits} hits, {cache.misses} misses")
+            cache.close()
+
+    # The summary is derived from the journal, in dataset order
+    if journal is not None:
+        journaled = latest_results(path)
+        results = [journaled[key] for key in keys if key in journaled]
+
+    summary = summarize(results)
+    if args.pack > 1:
+        summary["packing"] = summarize_packing(results)
+    summary["metrics"] = metrics.summary()
+    print_summary(summary)
+    if args.metrics_path:
+        write_prometheus(args.metrics_path, args.model_name, summary["metrics"])
+
     # Save detailed results to file
     if args.output_file_path:
-        output_data = {
-            "model": args.model_name,
-            "mode": args.mode,
-            "overall": {
-                "total": total_questions,
-                "correct": total_correct,
-                "accuracy": overall_accuracy
-            },
-            "per_category": {
-                category: {
-                    "total": category_total[category],
-                    "correct": category_correct[category],
-                    "accuracy": category_accuracy[category]
-                }
-                for category in category_accuracy
-            },
-            "detailed_results": results
-        }
-        
-        with open(args.output_file_path, "w", encoding="utf-8") as f:
-            json.dump(output_data, f, indent=2, ensure_ascii=False)
-        
-        print(f"\nDetailed results saved to: {args.output_file_path}")
+        save_results(args.output_file_path, args.model_name, args.mode, summary, results)
+        if args.results_db:
+            ingest_results(args.results_db, args.output_file_path)
 
 
-if __name__ == "__main__":
+def build_parser():
     parser = argparse.ArgumentParser(description="Emoji Art MCQ Evaluation")
     parser.add_argument("--model_name", type=str, required=True, help="Model name")
     parser.add_argument("--api_key", type=str, default="", help="API_KEY")
     parser.add_argument("--test_file_path", type=str, default="./data/test.jsonl")
     parser.add_argument("--output_file_path", type=str, help="Path to save results JSON")
     parser.add_argument("--category", type=str, help="Filter to specific category (optional)")
-    parser.add_argument("--mode", type=str, default="text", choices=["text", "image"], 
+    parser.add_argument("--mode", type=str, default="text", choices=["text", "image"],
                         help="Evaluation mode: text or image")
+    parser.add_argument("--image_source", type=str, default="file", choices=["file", "render", "archive"],
+                        help="Image mode input: emojis/<unicode>.png, grids rendered in memory, or --image_archive")
+    parser.add_argument("--image_archive", type=str, default=None, help="Archive built by render_images.py")
+    parser.add_argument("--image_scale", type=int, default=32, help="Pixels per grid cell when rendering")
     parser.add_argument("--start_idx", type=int, default=0, help="Start index (inclusive)")
     parser.add_argument("--end_idx", type=int, default=None, help="End index (exclusive)")
-    
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Concurrent requests; values above 1 use the asyncio engine")
+    parser.add_argument("--rpm", type=float, default=None, help="Request-per-minute limit (async mode)")
+    parser.add_argument("--tpm", type=float, default=None, help="Token-per-minute limit (async mode)")
+    parser.add_argument("--base_url", type=str, default=None,
+                        help="Override the provider endpoint, e.g. a local OpenAI-compatible server")
+    parser.add_argument("--max_connections", type=int, default=100, help="HTTP connection pool size")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--cache_path", type=str, default=None,
+                        help="SQLite response cache; repeated requests are served from it")
+    parser.add_argument("--cache_mode", type=str, default="readwrite", choices=["readwrite", "replay"],
+                        help="replay serves only cached responses and never calls the API")
+    parser.add_argument("--cache_max_mb", type=float, default=None, help="Evict LRU entries above this size")
+    parser.add_argument("--cache_max_age_days", type=float, default=None, help="Drop entries older than this")
+    parser.add_argument("--journal_path", type=str, default=None,
+                        help="JSONL journal of per-item results (default: <output_file_path>.journal.jsonl)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip items already recorded in the journal")
+    parser.add_argument("--max_retries", type=int, default=5,
+                        help="Retries for rate-limit and transient errors, with jittered backoff")
+    parser.add_argument("--metrics_path", type=str, default=None,
+                        help="Also write call metrics in Prometheus text format to this file")
+    parser.add_argument("--results_db", type=str, default=None,
+                        help="Also add the results file to this SQLite results store (see src/results_db.py)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream responses and close the stream once an explicit 'Answer: X' arrives")
+    parser.add_argument("--keep_reasoning", action="store_true",
+                        help="With --stream, read every response to the end instead of stopping early")
+    parser.add_argument("--pack", type=int, default=1,
+                        help="Ask this many questions per request (text mode); unanswered ones are re-run singly")
+    parser.add_argument("--batch", action="store_true",
+                        help="Submit the slice as provider batch jobs (OpenAI Batch / Anthropic Message Batches)")
+    parser.add_argument("--batch_state_path", type=str, default=None,
+                        help="JSON file of submitted batch job IDs (default: <output_file_path>.batch.json)")
+    parser.add_argument("--batch_dir", type=str, default="./.cache/batches",
+                        help="Job directory of the local fake batch backend used for stub models")
+    parser.add_argument("--poll_interval", type=float, default=5.0,
+                        help="Initial seconds between batch status polls, backed off up to a minute")
+
+    return parser
+
+def check_args(parser, args):
+    if args.pack > 1 and args.batch:
+        parser.error("--pack cannot be combined with --batch")
+    if args.pack > 1 and args.mode != "text":
+        parser.error("--pack is only supported in text mode")
+    if args.stream and args.batch:
+        parser.error("--stream cannot be combined with --batch")
+    if args.image_source == "archive" and not args.image_archive:
+        parser.error("--image_source archive needs --image_archive")
+    if args.results_db and not args.output_file_path:
+        parser.error("--results_db needs --output_file_path")
+
+
+if __name__ == "__main__":
+    parser = build_parser()
     args = parser.parse_args()
-    main(args)
\ No newline at end of file
+    check_args(parser, args)
+    main(args)
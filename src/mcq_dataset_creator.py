@@ -1,59 +1,133 @@
 from collections import defaultdict
-import random
+import argparse
 import json
 from pathlib import Path
 
+import numpy as np
+
+from utils.palette import PaletteQuantizer, palette
+from utils.similarity import GridSimilarityIndex
+
 INPUT_PATH = Path("emoji_data.jsonl")
 OUTPUT_PATH = Path("data/test.jsonl")
+NUM_DISTRACTORS = 3
 
 def load_raw(path):
     with path.open(encoding="utf-8") as f:
         return [json.loads(line) for line in f]
-    
+
 def save_data(data, path):
     with path.open("w", encoding="utf-8") as f:
         for x in data:
             f.write(json.dumps(x, ensure_ascii=False) + "\n")
 
-def category_to_names_dict(path):
-    data = load_raw(path)
-
-    dict = defaultdict(list)
-    for row in data:
-        dict[row['category']].append(row['name'])
-
-    return dict
-
-def color_to_names_dict(path):
-    data = load_raw(path)
-
-    dict = defaultdict(list)
-
-    for row in data:
-        dict[tuple(row['colors'])].append(row['name'])
-
-    return dict
-
-def get_choices(emoji_name, category):
-
-    choices = category_dict[category].copy()
-    choices.remove(emoji_name)
-    # Pick three random incorrect choices
-    return random.sample(choices, 3)
+def category_index(rows):
+    """Map each category to the array of row positions that belong to it."""
+    index = defaultdict(list)
+    for i, row in enumerate(rows):
+        index[row['category']].append(i)
+    return {cat: np.array(idx) for cat, idx in index.items()}
+
+def check_category_size(n, k=NUM_DISTRACTORS):
+    if n - 1 < k:
+        raise ValueError(f"Need at least {k + 1} items per category, got {n}")
+
+def sample_distractors(rng, n, k=NUM_DISTRACTORS):
+    """For each of n items in a category, draw k distinct other items.
+
+    Returns an (n, k) array of positions within the category. Draws come from
+    the n - 1 positions other than the target and are shifted past it, so the
+    category list is never copied or searched."""
+    check_category_size(n, k)
+
+    picks = rng.integers(0, n - 1, size=(n, k))
+    while True:
+        s = np.sort(picks, axis=1)
+        dup = (s[:, 1:] == s[:, :-1]).any(axis=1)
+        if not dup.any():
+            break
+        picks[dup] = rng.integers(0, n - 1, size=(int(dup.sum()), k))
+
+    return picks + (picks >= np.arange(n)[:, None])
+
+def hard_distractors(rows, index, rng, metric="hamming", pool=NUM_DISTRACTORS):
+    """Distractors chosen among the `pool` visually nearest items of the same category.
+
+    With pool == NUM_DISTRACTORS the nearest items are used directly, otherwise
+    NUM_DISTRACTORS of the `pool` nearest are sampled."""
+    if pool < NUM_DISTRACTORS:
+        raise ValueError(f"The distractor pool must hold at least {NUM_DISTRACTORS} items, got {pool}")
+    quantizer = PaletteQuantizer(palette)
+    grids = np.stack([quantizer.parse_emoji(row['emoji_art']) for row in rows])
+    sim = GridSimilarityIndex(grids, quantizer.transparent + 1, metric=metric)
+
+    distractors = np.empty((len(rows), NUM_DISTRACTORS), dtype=np.int64)
+    for cat in sorted(index):
+        members = index[cat]
+        check_category_size(len(members))
+        near = sim.nearest(members, min(pool, len(members) - 1), rng)
+        if near.shape[1] > NUM_DISTRACTORS:
+            keep = np.argsort(rng.random(near.shape), axis=1)[:, :NUM_DISTRACTORS]
+            near = np.take_along_axis(near, keep, axis=1)
+        distractors[members] = near
+    return distractors
+
+def iter_mcq(rows, seed=None, variants=1, hard_metric=None, hard_pool=NUM_DISTRACTORS):
+    """Yield MCQ rows for converted records (e.g. from emoji_converter.iter_records).
+
+    Distractors are drawn once per item from its category, uniformly or, when
+    `hard_metric` is set, among the most similar grids; each of the `variants`
+    copies of an item gets its own shuffle of the choices."""
+    rows = list(rows)
+    rng = np.random.default_rng(seed)
+    names = np.array([row['name'] for row in rows], dtype=object)
+
+    # distractor row positions per item
+    index = category_index(rows)
+    if hard_metric:
+        distractors = hard_distractors(rows, index, rng, metric=hard_metric, pool=hard_pool)
+    else:
+        distractors = np.empty((len(rows), NUM_DISTRACTORS), dtype=np.int64)
+        for cat in sorted(index):
+            members = index[cat]
+            distractors[members] = members[sample_distractors(rng, len(members))]
+
+    # column 0 is the answer; one permutation of the 4 choices per (item, variant)
+    candidates = np.concatenate([np.arange(len(rows))[:, None], distractors], axis=1)
+    ordered = np.sort(candidates, axis=1)
+    repeated = np.flatnonzero((ordered[:, 1:] == ordered[:, :-1]).any(axis=1))
+    if len(repeated):
+        raise ValueError(f"{len(repeated)} items would repeat a choice, e.g. {rows[repeated[0]]['unicode']}")
+    orders = np.argsort(rng.random((len(rows), variants, NUM_DISTRACTORS + 1)), axis=2)
+
+    for i, row in enumerate(rows):
+        for v in range(variants):
+            order = orders[i, v]
+            out = dict(row)
+            out['choices'] = names[candidates[i, order]].tolist()
+            out['labels'] = (order == 0).astype(int).tolist()
+            if variants > 1:
+                out['variant'] = v
+            yield out
+
+def build_mcq(rows, **kwargs):
+    return list(iter_mcq(rows, **kwargs))
 
 if __name__=="__main__":
-
-    category_dict = category_to_names_dict(INPUT_PATH)
-    data = load_raw(INPUT_PATH)
-
-    for row in data:
-
-        name, cat = row['name'], row['category']
-        choices = [name] + get_choices(name, cat)
-        choices_and_labels = list(zip(choices, [1, 0, 0, 0]))
-        random.shuffle(choices_and_labels)
-        choices, labels = zip(*choices_and_labels)
-        row['choices'] = choices
-        row['labels'] = labels
-
-    save_data(data, OUTPUT_PATH)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Formulate emoji art as multiple-choice questions")
+    parser.add_argument("--input_path", type=Path, default=INPUT_PATH)
+    parser.add_argument("--output_path", type=Path, default=OUTPUT_PATH)
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for distractors and choice order")
+    parser.add_argument("--variants", type=int, default=1,
+                        help="Number of independently shuffled copies of every question")
+    parser.add_argument("--hard", type=str, choices=["hamming", "histogram"],
+                        help="Pick distractors by grid similarity instead of uniformly")
+    parser.add_argument("--hard_pool", type=int, default=NUM_DISTRACTORS,
+                        help="Sample distractors among this many nearest neighbours")
+
+    args = parser.parse_args()
+    if args.hard and args.hard_pool < NUM_DISTRACTORS:
+        parser.error(f"--hard_pool must be at least {NUM_DISTRACTORS}")
+    mcq = iter_mcq(load_raw(args.input_path), seed=args.seed, variants=args.variants,
+                   hard_metric=args.hard, hard_pool=args.hard_pool)
+    save_data(mcq, args.output_path)
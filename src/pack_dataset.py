@@ -0,0 +1,21 @@
+import argparse
+import json
+
+from utils.grid_dataset import write_grid_dataset
+
+
+def iter_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack a JSONL MCQ dataset into the compact grid format")
+    parser.add_argument("--input_path", type=str, default="./data/test.jsonl")
+    parser.add_argument("--output_path", type=str, default="./data/test.grids.npy",
+                        help="Grid array path; the metadata sidecar is written next to it")
+
+    args = parser.parse_args()
+    write_grid_dataset(iter_jsonl(args.input_path), args.output_path)
+    print(f"✓ Grid dataset written: {args.output_path}")
@@ -0,0 +1,19 @@
+import argparse
+
+from evaluation import load_slice
+from utils.render import DEFAULT_SCALE, build_archive
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prerender a dataset slice as PNG images for image mode")
+    parser.add_argument("--test_file_path", type=str, default="./data/test.jsonl")
+    parser.add_argument("--output_path", type=str, default="./data/test.images.json",
+                        help="Archive of base64 PNG data URLs, keyed by unicode")
+    parser.add_argument("--category", type=str, help="Filter to specific category (optional)")
+    parser.add_argument("--start_idx", type=int, default=0, help="Start index (inclusive)")
+    parser.add_argument("--end_idx", type=int, default=None, help="End index (exclusive)")
+    parser.add_argument("--scale", type=int, default=DEFAULT_SCALE, help="Pixels per grid cell")
+
+    args = parser.parse_args()
+    count = build_archive(load_slice(args), args.output_path, scale=args.scale)
+    print(f"✓ {count} images written: {args.output_path}")
@@ -0,0 +1,115 @@
+"""Re-score saved result files offline with an answer-extraction strategy.
+
+Every result already stores the raw `response`, so a change in how answers
+are extracted needs no new API calls: choices are joined back from the
+dataset by unicode, `correct` is recomputed with the chosen strategy (see
+utils.post_processing.STRATEGIES) and overall/per_category are rebuilt.
+Answers from packed prompts are re-parsed from the stored group response.
+Items whose correctness changed are listed in a diff.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+
+from evaluation import summarize, summarize_packing
+from utils.journal import result_key
+from utils.load_dataset import EmojiDataset
+from utils.post_processing import STRATEGIES, parse_packed_answers
+
+
+def load_choices(test_file_path):
+    """Choice texts of every dataset item, keyed like journal results."""
+    return {result_key(data): data["ori_choices"] for data in EmojiDataset(data_path=test_file_path)}
+
+
+def rescore(output, choices, strategy="default"):
+    """Recompute correctness of a loaded results file in place; returns the changed items."""
+    extract = STRATEGIES[strategy]
+    changed = []
+    for result in output["detailed_results"]:
+        if "response" not in result:
+            continue  # the request itself failed
+        key = result_key(result)
+        if key not in choices:
+            raise KeyError(f"{key} from {output['model']} is not in the dataset")
+        if "packed_response" in result:
+            # the strategy applies to single answers; packed ones come from the answer list
+            number = result["packed_number"]
+            result["response"] = parse_packed_answers(result["packed_response"], number).get(number, "")
+            correct = result["response"] == result["target"]
+        else:
+            correct = extract(result["response"].strip(), choices[key]) == result["target"]
+        if correct != result["correct"]:
+            changed.append({
+                "model": output["model"],
+                "mode": output["mode"],
+                "unicode": result["unicode"],
+                "variant": result.get("variant"),
+                "category": result["category"],
+                "target": result["target"],
+                "response": result["response"],
+                "was_correct": result["correct"],
+                "correct": correct,
+            })
+            result["correct"] = correct
+
+    summary = summarize(output["detailed_results"])
+    output["overall"] = summary["overall"]
+    output["per_category"] = summary["per_category"]
+    if "macro_accuracy" in output:
+        output["macro_accuracy"] = summary["macro_accuracy"]
+    if "packing" in output:
+        output["packing"] = summarize_packing(output["detailed_results"])
+    return changed
+
+
+def main(args):
+    start = time.time()
+    paths = sorted(p for pattern in args.result_files for p in glob.glob(pattern))
+    if not paths:
+        raise FileNotFoundError(f"No result files match {args.result_files}")
+    choices = load_choices(args.test_file_path)
+
+    diff = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            output = json.load(f)
+        before = output["overall"]["accuracy"]
+        changed = rescore(output, choices, args.strategy)
+        diff.extend(changed)
+
+        gained = sum(c["correct"] for c in changed)
+        print(f"{output['model']:24s} {output['mode']:5s}: {before:.2%} -> {output['overall']['accuracy']:.2%} "
+              f"(+{gained} / -{len(changed) - gained})")
+
+        if args.in_place or args.output_dir:
+            out_path = path if args.in_place else os.path.join(args.output_dir, os.path.basename(path))
+            os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+            with open(out_path, "w", encoding="utf-8") as f:
+                json.dump(output, f, indent=2, ensure_ascii=False)
+
+    if args.diff_path:
+        with open(args.diff_path, "w", encoding="utf-8") as f:
+            json.dump(diff, f, indent=2, ensure_ascii=False)
+    print(f"{len(diff)} items changed across {len(paths)} files in {time.time() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-score saved evaluation results without calling the models")
+    parser.add_argument("result_files", nargs="*", default=["results/out-*.json"],
+                        help="Result files or glob patterns")
+    parser.add_argument("--test_file_path", type=str, default="./data/test.jsonl",
+                        help="Dataset the results were produced from (for the choice texts)")
+    parser.add_argument("--strategy", type=str, default="default", choices=sorted(STRATEGIES),
+                        help="Answer-extraction strategy")
+    parser.add_argument("--output_dir", type=str, default=None, help="Write re-scored files here")
+    parser.add_argument("--in_place", action="store_true", help="Overwrite the input files")
+    parser.add_argument("--diff_path", type=str, default=None,
+                        help="JSON list of items whose correctness changed")
+
+    args = parser.parse_args()
+    if args.in_place and args.output_dir:
+        parser.error("--in_place and --output_dir are mutually exclusive")
+    main(args)
@@ -0,0 +1,106 @@
+"""Query many evaluation runs at once through a SQLite results store.
+
+    # store the published runs (files already stored unchanged are skipped)
+    python3 src/results_db.py ingest "results/out-*.json"
+
+    python3 src/results_db.py runs
+    python3 src/results_db.py accuracy --model gpt-4o
+    python3 src/results_db.py failing out-gpt-4o out-claude-opus-4-5
+    python3 src/results_db.py regressions out-claude-sonnet-4-5 out-claude-opus-4-5
+
+    # rebuild a run's results file in the usual JSON schema
+    python3 src/results_db.py export out-gpt-4o --output_file_path /tmp/out-gpt-4o.json
+
+Runs are named after their results file (out-gpt-4o for results/out-gpt-4o.json)
+unless --name is given.
+"""
+import argparse
+import glob
+import time
+
+from evaluation import save_results, summarize
+from utils.results_store import ResultsStore
+
+
+def ingest(store, patterns, name=None, replace=False):
+    paths = sorted(p for pattern in patterns for p in glob.glob(pattern))
+    if not paths:
+        raise FileNotFoundError(f"No result files match {patterns}")
+    if name and len(paths) > 1:
+        raise ValueError("--name needs a single results file")
+    for path in paths:
+        added = store.ingest(path, name=name, replace=replace)
+        print(f"{path}: {'stored' if added else 'unchanged, skipped'}")
+
+
+def export(store, name, path):
+    model, mode, extras, results = store.run_results(name)
+    summary = {**summarize(results), **extras}
+    save_results(path, model, mode, summary, results, extras=tuple(extras))
+
+
+def print_accuracy(rows):
+    by_run = {}
+    for run, category, total, correct in rows:
+        by_run.setdefault(run, []).append((category, total, correct))
+    for run, categories in by_run.items():
+        total = sum(c[1] for c in categories)
+        correct = sum(c[2] for c in categories)
+        macro = sum(c[2] / c[1] for c in categories) / len(categories)
+        print(f"\n{run}: {correct}/{total} = {correct / total:.2%} (macro {macro:.2%})")
+        for category, cat_total, cat_correct in categories:
+            print(f"  {category:30s}: {cat_correct:4d}/{cat_total:4d} = {cat_correct / cat_total:.2%}")
+
+
+def main(args):
+    store = ResultsStore(args.db_path)
+    start = time.time()
+    try:
+        if args.command == "ingest":
+            ingest(store, args.targets or ["results/out-*.json"], args.name, args.replace)
+        elif args.command == "runs":
+            for name, model, mode, items, correct, source in store.runs(args.model, args.mode):
+                print(f"{name:32s} {model:24s} {mode:5s} {correct:4d}/{items:4d} = {correct / items:.2%}  {source}")
+        elif args.command == "accuracy":
+            print_accuracy(store.category_accuracy(args.model, args.mode))
+        elif args.command == "failing":
+            rows = store.always_failed(args.targets)
+            for unicode, variant, name, category, target in rows:
+                label = unicode if variant is None else f"{unicode}#{variant}"
+                print(f"{label:24s} {category:24s} {target}  {name}")
+            print(f"{len(rows)} items failed by every run")
+        elif args.command == "regressions":
+            if len(args.targets) != 2:
+                raise ValueError("regressions needs a base run and a new run")
+            base, new = args.targets
+            rows = store.regressions(base, new)
+            for unicode, variant, category, target, response in rows:
+                label = unicode if variant is None else f"{unicode}#{variant}"
+                print(f"{label:24s} {category:24s} {target}  {(response or '').strip()[:60]!r}")
+            print(f"{len(rows)} items regressed from {base} to {new}, "
+                  f"{len(store.regressions(new, base))} improved")
+        else:
+            if len(args.targets) != 1 or not args.output_file_path:
+                raise ValueError("export needs one run name and --output_file_path")
+            export(store, args.targets[0], args.output_file_path)
+    finally:
+        store.close()
+
+    print(f"({time.time() - start:.3f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-run queries over a SQLite store of evaluation results")
+    parser.add_argument("command", choices=["ingest", "runs", "accuracy", "failing", "regressions", "export"])
+    parser.add_argument("targets", nargs="*",
+                        help="Result files or glob patterns (ingest), or run names (failing, regressions, export)")
+    parser.add_argument("--db_path", type=str, default="./results.db", help="SQLite results store")
+    parser.add_argument("--name", type=str, default=None, help="Run name for a single ingested file")
+    parser.add_argument("--replace", action="store_true",
+                        help="Re-ingest a run whose results file changed since it was stored")
+    parser.add_argument("--model", type=str, default=None, help="Only runs of this model (runs, accuracy)")
+    parser.add_argument("--mode", type=str, default=None, help="Only runs in this mode (runs, accuracy)")
+    parser.add_argument("--output_file_path", type=str, default=None, help="Where export writes the results file")
+
+    # options may come before or after the run names / file patterns
+    main(parser.parse_intermixed_args())
@@ -0,0 +1,208 @@
+"""Sharded evaluation through a SQLite work queue.
+
+    # plan shards, run 4 local workers, merge (evaluation.py flags follow)
+    python3 src/shard_eval.py run --queue_path runs/gpt-4o.db --workers 4 \
+        --model_name gpt-4o --output_file_path results/out-gpt-4o.json
+
+    # more workers, e.g. on other hosts sharing the filesystem
+    python3 src/shard_eval.py work --queue_path runs/gpt-4o.db
+
+    # rebuild the final results file from the finished shards
+    python3 src/shard_eval.py merge --queue_path runs/gpt-4o.db
+
+Each shard is an ordinary evaluation.py run over a [start_idx, end_idx)
+range, journaled under <queue_path>.shards/, so a shard reclaimed from a
+dead worker resumes from what that worker already journaled.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import evaluation
+from utils.journal import result_key
+from utils.work_queue import WorkQueue
+
+
+def shard_dir(queue_path):
+    return queue_path + ".shards"
+
+
+def shard_output(queue_path, shard_id):
+    return os.path.join(shard_dir(queue_path), f"shard-{shard_id:05d}.json")
+
+
+def plan(queue_path, eval_args, shard_size, lease_seconds):
+    """Create the queue's shards for the slice selected by the evaluation arguments."""
+    total = len(evaluation.load_slice(eval_args))
+    # the API key stays out of the shared queue file; workers bring their own
+    config = {k: v for k, v in vars(eval_args).items() if k not in ("start_idx", "end_idx", "api_key")}
+    # shard ranges index the category-filtered dataset, like --start_idx/--end_idx
+    start = eval_args.start_idx
+    end = start + total
+
+    queue = WorkQueue(queue_path, lease_seconds=lease_seconds)
+    try:
+        if not queue.plan(start, end, shard_size, config):
+            raise ValueError(f"{queue_path} already holds shards of a different run")
+        print(f"Planned {queue_path}: {queue.counts()}")
+    finally:
+        queue.close()
+
+
+def shard_args(queue_path, config, api_key, shard_id, start, end):
+    args = argparse.Namespace(**config)
+    args.api_key = api_key
+    args.start_idx, args.end_idx = start, end
+    args.output_file_path = shard_output(queue_path, shard_id)
+    args.journal_path = None
+    args.batch_state_path = None
+    args.metrics_path = None
+    args.results_db = None  # the merged file is stored, not the shards
+    args.resume = True
+    return args
+
+
+def keep_leased(queue_path, lease_seconds, shard_id, worker, stop):
+    """Renew the lease every third of its length until `stop` is set."""
+    queue = WorkQueue(queue_path, lease_seconds=lease_seconds)
+    try:
+        while not stop.wait(lease_seconds / 3):
+            if not queue.renew(shard_id, worker):
+                print(f"Lost the lease on shard {shard_id}")
+                return
+    finally:
+        queue.close()
+
+
+def work(queue_path, lease_seconds, api_key="", poll_interval=10.0):
+    """Claim and evaluate shards until none are pending or leased."""
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    queue = WorkQueue(queue_path, lease_seconds=lease_seconds)
+    config = queue.config()
+    os.makedirs(shard_dir(queue_path), exist_ok=True)
+    try:
+        while True:
+            shard = queue.claim(worker)
+            if shard is None:
+                counts = queue.counts()
+                if counts["pending"] == 0 and counts["leased"] == 0:
+                    return
+                # other workers hold the rest; wait in case one of them dies
+                time.sleep(poll_interval)
+                continue
+
+            shard_id, start, end = shard
+            print(f"[{worker}] shard {shard_id}: items {start}-{end}")
+            stop = threading.Event()
+            heartbeat = threading.Thread(target=keep_leased, daemon=True,
+                                         args=(queue_path, lease_seconds, shard_id, worker, stop))
+            heartbeat.start()
+            args = shard_args(queue_path, config, api_key, shard_id, start, end)
+            try:
+                evaluation.main(args)
+                # evaluation.main returns normally after Ctrl-C with a partial result
+                with open(args.output_file_path, "r", encoding="utf-8") as f:
+                    finished = len(json.load(f)["detailed_results"])
+                if finished < end - start:
+                    raise KeyboardInterrupt(f"shard {shard_id} stopped after {finished} items")
+            except BaseException:
+                queue.release(shard_id, worker)
+                raise
+            finally:
+                stop.set()
+                heartbeat.join()
+            if not queue.complete(shard_id, worker):
+                print(f"[{worker}] shard {shard_id} was reclaimed by another worker; result left to it")
+    finally:
+        queue.close()
+
+
+def merge(queue_path, allow_partial=False):
+    """Rebuild the run's results file from the shard outputs, in dataset order."""
+    queue = WorkQueue(queue_path)
+    try:
+        config = queue.config()
+        shards = queue.shards()
+    finally:
+        queue.close()
+
+    unfinished = [s[0] for s in shards if s[3] != "done"]
+    if unfinished and not allow_partial:
+        raise RuntimeError(f"Shards not finished yet: {unfinished}")
+
+    results, seen = [], set()
+    for shard_id, start, end, status, worker, attempts in shards:
+        if status != "done":
+            continue
+        with open(shard_output(queue_path, shard_id), "r", encoding="utf-8") as f:
+            for result in json.load(f)["detailed_results"]:
+                key = result_key(result)
+                if key not in seen:
+                    seen.add(key)
+                    results.append(result)
+
+    summary = evaluation.summarize(results)
+    evaluation.print_summary(summary)
+    evaluation.save_results(config["output_file_path"], config["model_name"], config["mode"], summary, results,
+                            extras=("macro_accuracy",))
+    if config.get("results_db"):
+        evaluation.ingest_results(config["results_db"], config["output_file_path"])
+
+
+def run(queue_path, eval_args, shard_size, workers, lease_seconds):
+    """Plan, evaluate with local worker processes, and merge."""
+    plan(queue_path, eval_args, shard_size, lease_seconds)
+    env = dict(os.environ, API_KEY=eval_args.api_key) if eval_args.api_key else None
+    procs = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), "work",
+                          "--queue_path", queue_path, "--lease_seconds", str(lease_seconds)], env=env)
+        for _ in range(workers)
+    ]
+    failed = [p.args for p in procs if p.wait() != 0]
+    if failed:
+        raise RuntimeError(f"{len(failed)} workers failed; rerun to reclaim their shards")
+    merge(queue_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded evaluation with a SQLite work queue")
+    parser.add_argument("command", choices=["plan", "work", "merge", "run", "status"])
+    parser.add_argument("--queue_path", type=str, required=True, help="SQLite queue file (on a shared filesystem)")
+    parser.add_argument("--shard_size", type=int, default=100, help="Items per shard")
+    parser.add_argument("--workers", type=int, default=4, help="Local worker processes (run)")
+    parser.add_argument("--lease_seconds", type=float, default=600.0,
+                        help="Shards whose worker has not renewed its lease for this long are reclaimed")
+    parser.add_argument("--api_key", type=str, default=os.environ.get("API_KEY", ""),
+                        help="API key (default: $API_KEY)")
+    parser.add_argument("--allow_partial", action="store_true", help="Merge even if some shards are unfinished")
+
+    args, rest = parser.parse_known_args()
+    if args.command in ("plan", "run"):
+        eval_parser = evaluation.build_parser()
+        eval_args = eval_parser.parse_args(rest)
+        evaluation.check_args(eval_parser, eval_args)
+        eval_args.api_key = eval_args.api_key or args.api_key
+        if not eval_args.output_file_path:
+            parser.error("--output_file_path is required for the merged results")
+    elif rest:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+
+    if args.command == "plan":
+        plan(args.queue_path, eval_args, args.shard_size, args.lease_seconds)
+    elif args.command == "run":
+        run(args.queue_path, eval_args, args.shard_size, args.workers, args.lease_seconds)
+    elif args.command == "work":
+        work(args.queue_path, args.lease_seconds, api_key=args.api_key)
+    elif args.command == "merge":
+        merge(args.queue_path, allow_partial=args.allow_partial)
+    else:
+        queue = WorkQueue(args.queue_path)
+        for shard in queue.shards():
+            print("shard {}: items {}-{} {} (worker {}, attempts {})".format(*shard))
+        print(queue.counts())
+        queue.close()
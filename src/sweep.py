@@ -0,0 +1,263 @@
+"""Run many (model, mode, slice) evaluations in one process.
+
+The spec is a JSON file, e.g. scripts/sweep_published.json:
+
+    {
+      "test_file_path": "./data/test.jsonl",
+      "output_dir": "results",
+      "providers": {"anthropic": {"concurrency": 8, "api_key_env": "ANTHROPIC_API_KEY"}, ...},
+      "runs": [
+        {"model_name": "claude-haiku-4-5"},
+        {"model_name": "gpt-4o", "modes": ["text", "image"], "options": {"stream": true}},
+        {"model_name": "gemini-2.5-flash", "category": "Flags", "output_file_path": "results/flags.json"}
+      ]
+    }
+
+Every dataset is loaded once and all runs share one event loop. Each
+provider has its own concurrency/rpm/tpm budget, shared by all of its runs,
+so a slow provider never holds up the others. `options` are evaluation.py
+flags; every run writes its own results/out-*.json. Request budgets, retries
+and the HTTP pool are set for the whole sweep (see SWEEP_OPTIONS), not per run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from tqdm import tqdm
+
+from evaluation import (build_parser, check_args, evaluate_items_async, ingest_results, journal_path,
+                        open_cache, print_summary, save_results, select_slice, summarize)
+from utils.async_engine import ProviderLimits, RetryPolicy
+from utils.clients import aclose_clients, configure_clients
+from utils.journal import ResultJournal, finished_keys, latest_results, result_key
+from utils.llm_helper import provider_for
+from utils.load_dataset import EmojiDataset
+from utils.metrics import CallMetrics, write_prometheus
+from utils.response_cache import ResponseCache
+
+DEFAULT_API_KEY_ENV = {
+    "openai": "OPENAI_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY",
+    "gemini": "GEMINI_API_KEY",
+}
+
+# evaluation.py options that cannot differ between runs of one sweep, and where to set them instead
+SWEEP_OPTIONS = {
+    "concurrency": "the spec's providers block",
+    "rpm": "the spec's providers block",
+    "tpm": "the spec's providers block",
+    "max_retries": "sweep.py --max_retries",
+    "max_connections": "sweep.py --max_connections",
+    "timeout": "sweep.py --timeout",
+    "pack": None,
+    "batch": None,
+    "batch_state_path": None,
+    "batch_dir": None,
+    "poll_interval": None,
+}
+
+
+def load_spec(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def option_argv(options):
+    """evaluation.py command-line tokens for a dict of flag values."""
+    argv = []
+    for key, value in options.items():
+        if value is None or value is False:
+            continue
+        argv.append(f"--{key}")
+        if value is not True:
+            argv.append(str(value))
+    return argv
+
+
+def output_path(spec, run, mode):
+    if run.get("output_file_path"):
+        return run["output_file_path"]
+    suffix = "" if mode == "text" else f"-{mode}"
+    return os.path.join(spec.get("output_dir", "results"), f"out-{run['model_name']}{suffix}.json")
+
+
+def api_key(spec, provider):
+    env = spec.get("providers", {}).get(provider, {}).get("api_key_env", DEFAULT_API_KEY_ENV.get(provider))
+    return os.environ.get(env or "", "") or os.environ.get("API_KEY", "")
+
+
+def expand_runs(spec):
+    """One evaluation.py argument namespace per (run, mode) of the spec."""
+    parser = build_parser()
+    runs = []
+    for run in spec["runs"]:
+        for key in run.get("options", {}):
+            if key in SWEEP_OPTIONS:
+                where = SWEEP_OPTIONS[key]
+                parser.error(f"{run['model_name']}: --{key} is not supported per run in a sweep"
+                             + (f"; set it in {where}" if where else ""))
+        modes = run.get("modes") or [run.get("mode", "text")]
+        for mode in modes:
+            options = {
+                "test_file_path": spec.get("test_file_path", "./data/test.jsonl"),
+                **run.get("options", {}),
+                "model_name": run["model_name"],
+                "mode": mode,
+                "output_file_path": output_path(spec, run, mode),
+                "category": run.get("category"),
+                "start_idx": run.get("start_idx", 0),
+                "end_idx": run.get("end_idx"),
+            }
+            args = parser.parse_args(option_argv(options))
+            check_args(parser, args)
+            args.provider = provider_for(args.model_name, image=args.mode == "image")
+            args.api_key = args.api_key or api_key(spec, args.provider)
+            runs.append(args)
+
+    for kind, paths in (("results", [args.output_file_path for args in runs]),
+                        ("journal", [journal_path(args) for args in runs]),
+                        ("metrics", [args.metrics_path for args in runs if args.metrics_path])):
+        duplicates = sorted({p for p in paths if paths.count(p) > 1})
+        if duplicates:
+            raise ValueError(f"Several runs would write the same {kind} file: {duplicates}")
+    return runs
+
+
+def provider_limits(spec, runs):
+    limits = {}
+    for provider in sorted({args.provider for args in runs}):
+        budget = spec.get("providers", {}).get(provider, {})
+        limits[provider] = ProviderLimits(budget.get("concurrency", 8), rpm=budget.get("rpm"),
+                                          tpm=budget.get("tpm"))
+    return limits
+
+
+def open_caches(runs, shared=None):
+    """Response cache of every run: its own --cache_path if set, else the sweep's shared one."""
+    opened = {}
+    caches = []
+    for args in runs:
+        if not args.cache_path:
+            caches.append(shared)
+            continue
+        settings = (args.cache_path, args.cache_mode, args.cache_max_mb, args.cache_max_age_days)
+        if settings not in opened:
+            opened[settings] = open_cache(args)
+        caches.append(opened[settings])
+    return caches
+
+
+async def run_sweep(spec, runs, retry, caches=None, resume=False):
+    """Evaluate every run concurrently; returns [(args, results, metrics)] in spec order.
+
+    `caches` holds one response cache (or None) per run."""
+    datasets = {}
+    slices = []
+    for args in runs:
+        if args.test_file_path not in datasets:
+            datasets[args.test_file_path] = EmojiDataset(data_path=args.test_file_path)
+        slices.append(list(select_slice(datasets[args.test_file_path], args.category,
+                                        args.start_idx, args.end_idx)))
+
+    limits = provider_limits(spec, runs)
+    progress = tqdm(total=sum(len(items) for items in slices))
+
+    async def one(args, items, cache):
+        path = journal_path(args)
+        resumed = resume or args.resume
+        done = finished_keys(path) if resumed else set()
+        pending = [data for data in items if result_key(data) not in done]
+        progress.update(len(items) - len(pending))
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        journal = ResultJournal(path, resume=resumed)
+        metrics = CallMetrics()
+
+        def on_result(result):
+            journal.append(result)
+            progress.update()
+
+        try:
+            await evaluate_items_async(args, pending, limits[args.provider], retry, cache, on_result, metrics)
+        finally:
+            journal.close()
+
+        journaled = latest_results(path)
+        results = [journaled[result_key(data)] for data in items if result_key(data) in journaled]
+        return args, results, metrics
+
+    try:
+        caches = caches or [None] * len(runs)
+        return await asyncio.gather(*(one(args, items, cache) for args, items, cache in zip(runs, slices, caches)))
+    finally:
+        progress.close()
+        await aclose_clients()
+
+
+def main(sweep_args):
+    spec = load_spec(sweep_args.spec)
+    runs = expand_runs(spec)
+    configure_clients(max_connections=sweep_args.max_connections, timeout=sweep_args.timeout)
+    retry = RetryPolicy(max_retries=sweep_args.max_retries)
+    shared = ResponseCache(sweep_args.cache_path) if sweep_args.cache_path else None
+    caches = open_caches(runs, shared)
+
+    start = time.time()
+    try:
+        finished = asyncio.run(run_sweep(spec, runs, retry, caches, resume=sweep_args.resume))
+    finally:
+        for cache in {id(c): c for c in caches + [shared] if c is not None}.values():
+            print(f"Response cache {cache.path}: {cache.hits} hits, {cache.misses} misses")
+            cache.close()
+
+    report = []
+    for args, results, metrics in finished:
+        summary = summarize(results)
+        summary["metrics"] = metrics.summary()
+        if args.metrics_path:
+            write_prometheus(args.metrics_path, args.model_name, summary["metrics"])
+        save_results(args.output_file_path, args.model_name, args.mode, summary, results)
+        if args.results_db:
+            ingest_results(args.results_db, args.output_file_path)
+        if sweep_args.verbose:
+            print_summary(summary)
+        report.append({
+            "model": args.model_name,
+            "mode": args.mode,
+            "output_file_path": args.output_file_path,
+            "overall": summary["overall"],
+            "macro_accuracy": summary["macro_accuracy"],
+            "metrics": summary["metrics"],
+        })
+
+    print("\n" + "="*60)
+    print(f"SWEEP RESULTS ({time.time() - start:.1f}s)")
+    print("="*60)
+    for row in report:
+        latency = row["metrics"]["latency"]
+        p50 = f"{latency['p50']:.2f}s" if latency else "-"
+        print(f"{row['model'] + ' / ' + row['mode']:36s}: {row['overall']['correct']:4d}/{row['overall']['total']:4d} "
+              f"= {row['overall']['accuracy']:.2%} (macro {row['macro_accuracy']:.2%}), p50 {p50}")
+
+    if sweep_args.report_path:
+        with open(sweep_args.report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a models x modes x slices evaluation sweep")
+    parser.add_argument("--spec", type=str, default="./scripts/sweep_published.json", help="Sweep spec JSON")
+    parser.add_argument("--report_path", type=str, default=None,
+                        help="Also write per-run accuracy and call metrics to this JSON file")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip items already recorded in each run's journal")
+    parser.add_argument("--cache_path", type=str, default=None, help="SQLite response cache shared by all runs")
+    parser.add_argument("--max_connections", type=int, default=100, help="HTTP connection pool size")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--max_retries", type=int, default=5,
+                        help="Retries for rate-limit and transient errors, with jittered backoff")
+    parser.add_argument("--verbose", action="store_true", help="Print the full summary of every run")
+
+    main(parser.parse_args())
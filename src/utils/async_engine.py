@@ -0,0 +1,130 @@
+import asyncio
+import random
+import time
+
+# Status codes worth retrying: timeouts, conflicts, rate limits, server errors
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+RETRYABLE_NAMES = ("RateLimit", "Timeout", "Connection", "InternalServer", "Overloaded", "ServiceUnavailable")
+
+
+def status_code(exc):
+    code = getattr(exc, "status_code", None) or getattr(exc, "code", None) or getattr(exc, "status", None)
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(exc):
+    """Transient errors (429s, 5xx, timeouts, dropped connections) are retried."""
+    code = status_code(exc)
+    if code is not None:
+        return code in RETRYABLE_STATUS
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    return any(name in type(exc).__name__ for name in RETRYABLE_NAMES)
+
+
+def retry_after(exc):
+    """Seconds the server asked us to wait, if it sent a Retry-After header."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Jittered exponential backoff ("full jitter") for transient errors."""
+
+    def __init__(self, max_retries=5, base_delay=1.0, max_delay=60.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, exc):
+        wait = retry_after(exc)
+        if wait is not None:
+            return min(wait, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, fn, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                time.sleep(self.delay(attempt, e))
+
+    async def acall(self, fn, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                await asyncio.sleep(self.delay(attempt, e))
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at `per_minute` units per minute."""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, amount=1):
+        # requests larger than the bucket would never fit; let them drain it instead
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class ProviderLimits:
+    """Concurrency, request-rate and token-rate budget of one provider."""
+
+    def __init__(self, concurrency=8, rpm=None, tpm=None):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+
+    async def wait(self, tokens):
+        if self.requests:
+            await self.requests.acquire(1)
+        if self.tokens:
+            await self.tokens.acquire(tokens)
+
+
+def estimate_tokens(prompt, output_tokens=256):
+    """Rough token count for rate limiting (~4 UTF-8 bytes per token)."""
+    return len(prompt.encode("utf-8")) // 4 + output_tokens
+
+
+async def run_ordered(items, worker, on_done=None):
+    """Run worker(i, item) concurrently for every item; results keep input order.
+
+    Concurrency is bounded by whatever limits the worker acquires."""
+
+    async def run(i, item):
+        result = await worker(i, item)
+        if on_done:
+            on_done(i, result)
+        return result
+
+    return await asyncio.gather(*(run(i, item) for i, item in enumerate(items)))
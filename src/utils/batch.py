@@ -0,0 +1,230 @@
+"""Provider bulk-job execution (OpenAI Batch, Anthropic Message Batches).
+
+Each backend exposes the same small interface:
+
+    submit(requests) -> job_id     requests are (custom_id, prompt, image_path) tuples
+    status(job_id)   -> "running" | "ended"
+    results(job_id)  -> {custom_id: response text or Exception}
+
+FakeBatchBackend implements it on top of a local directory so batch runs
+can be exercised offline.
+"""
+import hashlib
+import io
+import json
+import os
+import time
+import uuid
+
+from utils import stub_provider
+from utils.clients import get_client
+from utils.llm_helper import CLAUDE_MAX_TOKENS, DEFAULT_BASE_URLS, openai_input, provider_for
+
+
+class BatchItemError(Exception):
+    """A request that the provider reported as failed inside a batch job."""
+
+
+class OpenAIBatchBackend:
+    max_requests = 50000
+    done_states = {"completed", "failed", "expired", "cancelled"}
+
+    def __init__(self, client, model_name):
+        self.client = client
+        self.model_name = model_name
+
+    def submit(self, requests):
+        lines = [
+            json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/responses",
+                "body": {"model": self.model_name, "input": openai_input(prompt, image_path)},
+            }, ensure_ascii=False)
+            for custom_id, prompt, image_path in requests
+        ]
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        input_file = self.client.files.create(file=("batch.jsonl", io.BytesIO(data)), purpose="batch")
+        job = self.client.batches.create(
+            input_file_id=input_file.id, endpoint="/v1/responses", completion_window="24h"
+        )
+        return job.id
+
+    def status(self, job_id):
+        job = self.client.batches.retrieve(job_id)
+        return "ended" if job.status in self.done_states else "running"
+
+    def results(self, job_id):
+        job = self.client.batches.retrieve(job_id)
+        out = {}
+        for file_id in (job.output_file_id, job.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    entry = json.loads(line)
+                    out[entry["custom_id"]] = self.parse(entry)
+        return out
+
+    @staticmethod
+    def parse(entry):
+        response = entry.get("response") or {}
+        if entry.get("error") or response.get("status_code") != 200:
+            return BatchItemError(str(entry.get("error") or response.get("body")))
+        texts = [
+            c["text"]
+            for item in response["body"].get("output", []) if item.get("type") == "message"
+            for c in item.get("content", []) if c.get("type") == "output_text"
+        ]
+        return "".join(texts).strip()
+
+
+class AnthropicBatchBackend:
+    max_requests = 100000
+
+    def __init__(self, client, model_name):
+        self.client = client
+        self.model_name = model_name
+
+    def submit(self, requests):
+        job = self.client.messages.batches.create(requests=[
+            {
+                "custom_id": custom_id,
+                "params": {
+                    "model": self.model_name,
+                    "max_tokens": CLAUDE_MAX_TOKENS,
+                    "messages": [{"role": "user", "content": prompt}],
+                },
+            }
+            for custom_id, prompt, image_path in requests
+        ])
+        return job.id
+
+    def status(self, job_id):
+        job = self.client.messages.batches.retrieve(job_id)
+        return "ended" if job.processing_status == "ended" else "running"
+
+    def results(self, job_id):
+        out = {}
+        for entry in self.client.messages.batches.results(job_id):
+            if entry.result.type == "succeeded":
+                out[entry.custom_id] = entry.result.message.content[0].text.strip()
+            else:
+                out[entry.custom_id] = BatchItemError(f"{entry.result.type}: {getattr(entry.result, 'error', '')}")
+        return out
+
+
+class FakeBatchBackend:
+    """File-backed stand-in for a provider batch API.
+
+    Jobs live in `root/<job_id>/`; a job ends `delay` seconds after it was
+    submitted and answers with utils.stub_provider."""
+
+    max_requests = 1000
+
+    def __init__(self, root, model_name, delay=1.0):
+        self.root = root
+        self.model_name = model_name
+        self.delay = delay
+        os.makedirs(root, exist_ok=True)
+
+    def submit(self, requests):
+        job_id = f"batch_{uuid.uuid4().hex[:12]}"
+        job_dir = os.path.join(self.root, job_id)
+        os.makedirs(job_dir)
+        with open(os.path.join(job_dir, "requests.jsonl"), "w", encoding="utf-8") as f:
+            for custom_id, prompt, image_path in requests:
+                f.write(json.dumps({"custom_id": custom_id, "prompt": prompt}, ensure_ascii=False) + "\n")
+        with open(os.path.join(job_dir, "job.json"), "w", encoding="utf-8") as f:
+            json.dump({"model": self.model_name, "ends_at": time.time() + self.delay}, f)
+        return job_id
+
+    def status(self, job_id):
+        with open(os.path.join(self.root, job_id, "job.json"), "r", encoding="utf-8") as f:
+            job = json.load(f)
+        return "ended" if time.time() >= job["ends_at"] else "running"
+
+    def results(self, job_id):
+        out = {}
+        with open(os.path.join(self.root, job_id, "requests.jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                request = json.loads(line)
+                out[request["custom_id"]] = stub_provider.answer(self.model_name, request["prompt"])
+        return out
+
+
+def make_backend(model_name, api_key, base_url=None, image=False, fake_dir="./.cache/batches"):
+    """Batch backend for the provider that serves model_name."""
+    provider = provider_for(model_name, image=image)
+    if provider == "stub":
+        return FakeBatchBackend(fake_dir, model_name)
+    client = get_client(provider, api_key, base_url or DEFAULT_BASE_URLS.get(provider))
+    if provider == "openai":
+        return OpenAIBatchBackend(client, model_name)
+    if provider == "anthropic":
+        return AnthropicBatchBackend(client, model_name)
+    raise ValueError(f"Batch mode is not supported for {provider} models")
+
+
+def batch_id(key):
+    """Provider-safe custom_id (Anthropic allows only [A-Za-z0-9_-]{1,64}) for a request key."""
+    return "item-" + hashlib.sha256(key.encode("utf-8")).hexdigest()[:24]
+
+
+def load_state(path, run):
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("run") == run:
+            return state
+    return {"run": run, "jobs": []}
+
+
+def save_state(path, state):
+    if not path:
+        return
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def run_batches(backend, requests, state_path=None, run=None, resume=False, poll_interval=5.0,
+                max_poll_interval=60.0):
+    """Submit requests as bulk jobs, wait for them and return {custom_id: text or Exception}.
+
+    Job IDs are persisted to `state_path` as soon as they are created, so an
+    interrupted run resumed with `resume` polls the same jobs instead of
+    resubmitting. State saved for a different `run` (e.g. another model) is
+    discarded, and the state file is removed once every job has ended."""
+    state = load_state(state_path, run) if resume else {"run": run, "jobs": []}
+    submitted = {cid for job in state["jobs"] for cid in job["custom_ids"]}
+    todo = [r for r in requests if r[0] not in submitted]
+
+    for start in range(0, len(todo), backend.max_requests):
+        chunk = todo[start:start + backend.max_requests]
+        job_id = backend.submit(chunk)
+        state["jobs"].append({"job_id": job_id, "custom_ids": [r[0] for r in chunk]})
+        save_state(state_path, state)
+        print(f"Submitted batch job {job_id} with {len(chunk)} requests")
+
+    wanted = {r[0] for r in requests}
+    out = {}
+    delay = poll_interval
+    pending = [job for job in state["jobs"] if wanted.intersection(job["custom_ids"])]
+    while pending:
+        still_running = []
+        for job in pending:
+            if backend.status(job["job_id"]) == "ended":
+                out.update(backend.results(job["job_id"]))
+                print(f"Batch job {job['job_id']} ended")
+            else:
+                still_running.append(job)
+        pending = still_running
+        if pending:
+            time.sleep(delay)
+            delay = min(delay * 1.5, max_poll_interval)
+
+    if state_path and os.path.exists(state_path):
+        os.remove(state_path)
+    return {cid: out.get(cid, BatchItemError("missing from batch results")) for cid in wanted}
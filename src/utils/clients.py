@@ -0,0 +1,104 @@
+import threading
+
+# Connection-pool and timeout settings shared by every provider client
+CLIENT_SETTINGS = {
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 30.0,
+    "timeout": 120.0,
+    "connect_timeout": 10.0,
+}
+
+_clients = {}
+_http = {}
+_lock = threading.Lock()
+
+
+def configure_clients(**settings):
+    """Override CLIENT_SETTINGS; only affects clients created afterwards."""
+    unknown = set(settings) - set(CLIENT_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown client settings: {sorted(unknown)}")
+    CLIENT_SETTINGS.update(settings)
+
+
+def http_client(use_async=False):
+    """The shared httpx transport (one sync and one async pool per process)."""
+    import httpx
+
+    with _lock:
+        if use_async not in _http:
+            s = CLIENT_SETTINGS
+            kwargs = {
+                "limits": httpx.Limits(
+                    max_connections=s["max_connections"],
+                    max_keepalive_connections=s["max_keepalive_connections"],
+                    keepalive_expiry=s["keepalive_expiry"],
+                ),
+                "timeout": httpx.Timeout(s["timeout"], connect=s["connect_timeout"]),
+                "follow_redirects": True,
+            }
+            _http[use_async] = httpx.AsyncClient(**kwargs) if use_async else httpx.Client(**kwargs)
+        return _http[use_async]
+
+
+def build_client(provider, api_key, base_url, use_async):
+    from utils.llm_helper import import_provider
+
+    http = http_client(use_async)
+    sdk = import_provider(provider)
+    # retries are handled by utils.async_engine.RetryPolicy, not by the SDKs
+    if provider == "openai":
+        cls = sdk.AsyncOpenAI if use_async else sdk.OpenAI
+        return cls(api_key=api_key, base_url=base_url, http_client=http, max_retries=0)
+    if provider == "anthropic":
+        cls = sdk.AsyncAnthropic if use_async else sdk.Anthropic
+        return cls(api_key=api_key, base_url=base_url, http_client=http, max_retries=0)
+    if provider == "gemini":
+        from google.genai import types
+
+        options = types.HttpOptions(
+            base_url=base_url,
+            timeout=int(CLIENT_SETTINGS["timeout"] * 1000),
+            **({"httpx_async_client": http} if use_async else {"httpx_client": http}),
+        )
+        return sdk.Client(api_key=api_key, http_options=options)
+    raise ValueError(f"Unknown provider: {provider}")
+
+
+def get_client(provider, api_key, base_url=None, use_async=False):
+    """One reusable SDK client per (provider, api_key, base_url, sync/async)."""
+    key = (provider, api_key, base_url, use_async)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+        if client is None:
+            client = build_client(provider, api_key, base_url, use_async)
+            with _lock:
+                client = _clients.setdefault(key, client)
+    return client
+
+
+def close_clients():
+    """Close the shared transports; call at the end of a run."""
+    with _lock:
+        http = list(_http.items())
+        _http.clear()
+        _clients.clear()
+    for use_async, client in http:
+        if not use_async:
+            client.close()
+
+
+async def aclose_clients():
+    """Async variant of close_clients, to be awaited inside the event loop."""
+    with _lock:
+        http = list(_http.items())
+        _http.clear()
+        _clients.clear()
+    for use_async, client in http:
+        if use_async:
+            await client.aclose()
+        else:
+            client.close()
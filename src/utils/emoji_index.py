@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+from importlib import metadata
+
+CACHE_DIR = "./.cache"
+INDEX_VERSION = 1
+INDEX_FILE = "emoji_index.json"
+
+
+def get_emoji_safe(ch):
+    import emojis
+
+    e = emojis.db.get_emoji_by_code(ch)
+    if e is None and not ch.endswith("\ufe0f"):
+        e = emojis.db.get_emoji_by_code(ch + "\ufe0f")
+    return e
+
+
+def parse_emoji_list(lines):
+    """Parse LIST_OF_EMOJI.txt lines into [unicode, name, char, category] entries."""
+    entries = []
+    for line in lines:
+        line = line.strip()
+        if not line or ' - ' not in line:
+            continue
+
+        parts = line.split(' - ')
+        if len(parts) >= 3:
+            emoji_char = parts[0].strip()
+            emoji_name = parts[1].strip()
+            filename = parts[2].strip()
+            emoji_obj = get_emoji_safe(emoji_char)
+
+            if emoji_obj:
+                unicode_code = filename.replace('.png', '')
+                entries.append([unicode_code, emoji_name, emoji_char, emoji_obj.category])
+    return entries
+
+
+def to_maps(entries):
+    """Build the unicode -> (name, char, category) and category -> names maps."""
+    emoji_map = {}
+    cat_map = {}
+    for unicode_code, emoji_name, emoji_char, emoji_cat in entries:
+        emoji_map[unicode_code] = (emoji_name, emoji_char, emoji_cat)
+        cat_map.setdefault(emoji_cat, []).append(emoji_name)
+    return emoji_map, cat_map
+
+
+def source_info(list_file):
+    st = os.stat(list_file)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def file_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_emoji_index(list_file, cache_dir=CACHE_DIR):
+    """Load the emoji metadata index for `list_file`, building it if needed.
+
+    The index is persisted under `cache_dir` and rebuilt when the list file's
+    contents, the index version or the installed `emojis` package change.
+    Returns the same (emoji_map, cat_map) pair as `to_maps`.
+    """
+    path = os.path.join(cache_dir, INDEX_FILE)
+    key = {
+        "version": INDEX_VERSION,
+        "emojis": metadata.version("emojis"),
+        "list_file": os.path.abspath(list_file),
+    }
+    info = source_info(list_file)
+
+    index = None
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("key") != key:
+            index = None
+        elif index["source"] != info:
+            # size/mtime changed; only rebuild if the contents did too
+            digest = file_digest(list_file)
+            if index["sha256"] != digest:
+                index = None
+            else:
+                index["source"] = info
+                save_index(path, index)
+
+    if index is None:
+        with open(list_file, "r", encoding="utf-8") as f:
+            entries = parse_emoji_list(f)
+        index = {
+            "key": key,
+            "source": info,
+            "sha256": file_digest(list_file),
+            "entries": entries,
+        }
+        os.makedirs(cache_dir, exist_ok=True)
+        save_index(path, index)
+
+    return to_maps(index["entries"])
+
+
+def save_index(path, index):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
@@ -0,0 +1,138 @@
+import json
+import os
+
+import numpy as np
+
+from utils.palette import PaletteQuantizer, palette, render
+
+FORMAT_VERSION = 2
+GRIDS_SUFFIX = ".grids.npy"
+# next to the grids: a small JSON header, a per-record table, and the record
+# strings as one UTF-8 blob with an offsets array, all memory-mapped on read
+META_SUFFIX = ".meta.json"
+RECORDS_SUFFIX = ".records.npy"
+OFFSETS_SUFFIX = ".offsets.npy"
+TEXT_SUFFIX = ".text.bin"
+
+# columns of the record table
+FIRST_STRING, CHOICE_COUNT, ANSWER, CATEGORY, VARIANT = range(5)
+NO_VARIANT = -1
+
+
+def sidecar_path(grids_path, suffix):
+    return grids_path[:-len(GRIDS_SUFFIX)] + suffix
+
+
+def meta_path(grids_path):
+    return sidecar_path(grids_path, META_SUFFIX)
+
+
+def write_grid_dataset(rows, grids_path, quantizer=None):
+    """Write MCQ rows as a uint8 grid array plus memory-mappable metadata.
+
+    Grids hold palette indices (see PaletteQuantizer). Each record's name,
+    unicode and choices are consecutive strings of the text blob; categories
+    are stored as codes into a list in the JSON header."""
+    if not grids_path.endswith(GRIDS_SUFFIX):
+        raise ValueError(f"Grid dataset path must end with {GRIDS_SUFFIX}: {grids_path}")
+    quantizer = quantizer or PaletteQuantizer(palette)
+
+    grids, records, strings = [], [], []
+    categories = {}
+    for row in rows:
+        grids.append(quantizer.parse_emoji(row["emoji_art"]))
+        variant = row.get("variant")
+        records.append((len(strings), len(row["choices"]), list(row["labels"]).index(1),
+                        categories.setdefault(row["category"], len(categories)),
+                        NO_VARIANT if variant is None else variant))
+        strings.extend([row["name"], row["unicode"], *row["choices"]])
+
+    encoded = [text.encode("utf-8") for text in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+    meta = {
+        "version": FORMAT_VERSION,
+        "count": len(grids),
+        "emoji_lut": quantizer.emoji_lut.tolist(),
+        "ascii_lut": quantizer.ascii_lut.tolist(),
+        "categories": list(categories),
+    }
+    np.save(grids_path, np.stack(grids).astype(np.uint8))
+    np.save(sidecar_path(grids_path, RECORDS_SUFFIX), np.array(records, dtype=np.int64).reshape(-1, 5))
+    np.save(sidecar_path(grids_path, OFFSETS_SUFFIX), offsets)
+    with open(sidecar_path(grids_path, TEXT_SUFFIX), "wb") as f:
+        f.write(b"".join(encoded))
+    with open(meta_path(grids_path), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+
+class LazyColumn:
+    """Read-only sequence whose items are computed from the record index on access."""
+
+    def __init__(self, length, get):
+        self.length = length
+        self.get = get
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, idx):
+        return self.get(idx)
+
+
+class GridRecords:
+    """Read side of the grid format: grids, the record table and the strings
+    are memory-mapped, and the text renderings are built only when a record
+    is requested, so memory stays flat whatever the dataset size."""
+
+    def __init__(self, grids_path):
+        with open(meta_path(grids_path), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported grid dataset version {meta['version']}; "
+                             "repack it with src/pack_dataset.py")
+
+        self.grids = np.load(grids_path, mmap_mode="r")
+        self.records = np.load(sidecar_path(grids_path, RECORDS_SUFFIX), mmap_mode="r")
+        self.offsets = np.load(sidecar_path(grids_path, OFFSETS_SUFFIX), mmap_mode="r")
+        text_path = sidecar_path(grids_path, TEXT_SUFFIX)
+        # an empty file cannot be memory-mapped
+        self.text = np.memmap(text_path, dtype=np.uint8, mode="r") if os.path.getsize(text_path) else b""
+        self.categories = meta["categories"]
+        self.emoji_lut = np.array(meta["emoji_lut"], dtype=object)
+        self.ascii_lut = np.array(meta["ascii_lut"], dtype=object)
+        self.transparent = len(self.emoji_lut) - 1
+
+        # the columns EmojiDataset.filter needs
+        self.columns = {
+            "unicode": LazyColumn(len(self), lambda i: self.string(int(self.records[i, FIRST_STRING]) + 1)),
+            "category": LazyColumn(len(self), lambda i: self.categories[self.records[i, CATEGORY]]),
+        }
+
+    def string(self, n):
+        lo, hi = self.offsets[n], self.offsets[n + 1]
+        return bytes(self.text[lo:hi]).decode("utf-8")
+
+    def __len__(self):
+        return len(self.grids)
+
+    def __getitem__(self, idx):
+        grid = np.asarray(self.grids[idx])
+        first, count, answer, category, variant = (int(v) for v in self.records[idx])
+        choices = [self.string(first + 2 + k) for k in range(count)]
+        used = np.bincount(grid.ravel(), minlength=self.transparent + 1)[:self.transparent]
+
+        record = {
+            "name": self.string(first),
+            "unicode": self.string(first + 1),
+            "category": self.categories[category],
+            "emoji_art": render(grid, self.emoji_lut),
+            "colors": self.emoji_lut[:self.transparent][used > 0].tolist(),
+            "ascii_art": render(grid, self.ascii_lut),
+            "choices": choices,
+            "labels": [int(i == answer) for i in range(count)],
+        }
+        if variant != NO_VARIANT:
+            record["variant"] = variant
+        return record
@@ -0,0 +1,67 @@
+import json
+import os
+
+
+def result_key(result):
+    """Identity of a dataset item in a journal (unicode, plus variant for multi-variant datasets)."""
+    variant = result.get("variant")
+    return result["unicode"] if variant is None else f"{result['unicode']}#{variant}"
+
+
+def read_journal(path):
+    """Results recorded in a journal; a line cut short by a crash is ignored."""
+    results = []
+    if not os.path.exists(path):
+        return results
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                results.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return results
+
+
+def latest_results(path):
+    """{result key: latest journaled result}; a retried item's newest entry wins."""
+    return {result_key(r): r for r in read_journal(path)}
+
+
+def finished_keys(path):
+    """Keys of items whose latest journaled result is not an error, so --resume retries failures."""
+    return {key for key, r in latest_results(path).items() if "error" not in r}
+
+
+class ResultJournal:
+    """Append-only JSONL log of per-item results, written as each item completes."""
+
+    def __init__(self, path, resume=False, fsync_every=20):
+        if resume and os.path.exists(path):
+            self.truncate_partial_line(path)
+        self.f = open(path, "a" if resume else "w", encoding="utf-8")
+        self.fsync_every = fsync_every
+        self.pending = 0
+
+    @staticmethod
+    def truncate_partial_line(path):
+        # drop a trailing line left incomplete by a crash so appends start cleanly
+        with open(path, "rb+") as f:
+            data = f.read()
+            end = data.rfind(b"\n") + 1
+            if end != len(data):
+                f.truncate(end)
+
+    def append(self, result):
+        self.f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self.f.flush()
+        self.pending += 1
+        if self.pending >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        os.fsync(self.f.fileno())
+        self.pending = 0
+
+    def close(self):
+        self.sync()
+        self.f.close()
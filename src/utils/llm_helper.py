@@ -1,10 +1,75 @@
-import anthropic
-from openai import OpenAI
-from google import genai
+import importlib
+import mimetypes
 import os
 import time
 import base64
 
+from utils.clients import get_client
+
+# Provider SDKs are imported on first use so a run only pays for the one it needs
+PROVIDER_MODULES = {
+    "openai": "openai",
+    "anthropic": "anthropic",
+    "gemini": "google.genai",
+    "stub": "utils.stub_provider",
+}
+
+DEFAULT_BASE_URLS = {
+    "openai": os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+}
+
+CLAUDE_MAX_TOKENS = 4096
+
+
+def provider_for(model_name, image=False):
+    """Name of the provider that serves model_name."""
+    if model_name.startswith("stub"):
+        return "stub"
+    # Image baseline: Only OpenAI *actually supports* Responses+image
+    if image or model_name.startswith("gpt"):
+        return "openai"
+    if model_name.startswith("claude"):
+        return "anthropic"
+    if model_name.startswith("gemini"):
+        return "gemini"
+    raise ValueError(f"Unknown model: {model_name}")
+
+
+def import_provider(provider):
+    return importlib.import_module(PROVIDER_MODULES[provider])
+
+
+def request_params(model_name, image=False):
+    """Generation parameters sent with a request besides the prompt (used for cache keys)."""
+    provider = provider_for(model_name, image=image)
+    params = {"provider": provider}
+    if provider == "anthropic":
+        params["max_tokens"] = CLAUDE_MAX_TOKENS
+    return params
+
+
+def usage(start, input_tokens=None, output_tokens=None, ttft=None):
+    """Per-call measurements returned alongside the response text."""
+    return {
+        "latency": time.time() - start,
+        "ttft": ttft,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+    }
+
+
+def response_usage(provider, response, start):
+    """usage() filled from a provider response object."""
+    if provider == "gemini":
+        meta = response.usage_metadata
+        if meta is None:
+            return usage(start)
+        return usage(start, meta.prompt_token_count, meta.candidates_token_count)
+    tokens = response.usage
+    if tokens is None:
+        return usage(start)
+    return usage(start, tokens.input_tokens, tokens.output_tokens)
+
 
 # Function to encode the image
 def encode_image(image_path):
@@ -12,69 +77,310 @@ def encode_image(image_path):
         return base64.b64encode(image_file.read()).decode("utf-8")
 
 
-def call_llm(model_name, api_key, prompt, image_path=None):
+def image_url(image_path):
+    """Data URL for an image file, typed by its extension; data: URLs pass through."""
+    if image_path.startswith("data:"):
+        return image_path
+    mime = mimetypes.guess_type(image_path)[0] or "image/png"
+    return f"data:{mime};base64,{encode_image(image_path)}"
+
+
+def image_bytes(image_path):
+    """Raw bytes of an image file or data: URL."""
+    if image_path.startswith("data:"):
+        return base64.b64decode(image_path.split(",", 1)[1])
+    with open(image_path, "rb") as f:
+        return f.read()
+
+
+def openai_input(prompt, image_path=None):
+    if not image_path:
+        return [{"role": "user", "content": prompt}]
+
+    return [
+        {
+            "role": "user",
+            "content": [
+                {"type": "input_text", "text": prompt},
+                {
+                    "type": "input_image",
+                    "image_url": image_url(image_path),
+                },
+            ],
+        }
+    ]
+
+
+def call_llm(model_name, api_key, prompt, image_path=None, base_url=None):
     """
     Clean generic interface for calling different LLM APIs.
     Correctly handles:
     - GPT (OpenAI)
     - Claude (Anthropic)
     - Gemini
+    Clients are created once per (provider, api_key, base_url) and reused,
+    see utils.clients.
+
+    image_path may be a file or a data: URL (see utils.render).
+
+    Returns the response text and a usage() dict with the call's latency and
+    token counts.
     """
 
     start = time.time()
+    provider = provider_for(model_name, image=bool(image_path))
+    base_url = base_url or DEFAULT_BASE_URLS.get(provider)
 
-    # -------------------------------------------------------------
-    # CASE 1 — Image baseline: Only OpenAI *actually supports* Responses+image
-    # -------------------------------------------------------------
-    if image_path:
-        base64_image = encode_image(image_path)
+    # Local stub provider for offline runs
+    if provider == "stub":
+        stub = import_provider("stub")
+        text = stub.complete(model_name, prompt)
+        return text, usage(start, stub.count_tokens(prompt), stub.count_tokens(text))
 
-        client = OpenAI(api_key=api_key, base_url="https://api.openai.com/v1")
-        response = client.responses.create(
-            model=model_name,
-            input=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "input_text", "text": prompt},
-                        {
-                            "type": "input_image",
-                            "image_url": f"data:image/jpeg;base64,{base64_image}",
-                        },
-                    ],
-                }
-            ],
-        )
-        return response.output_text.strip(), time.time() - start
+    client = get_client(provider, api_key, base_url)
 
     # -------------------------------------------------------------
-    # CASE 2 — OpenAI GPT text models
+    # CASE 1 — OpenAI: GPT text models and the image baseline
     # -------------------------------------------------------------
-    if model_name.startswith("gpt"):
-        client = OpenAI(api_key=api_key, base_url="https://api.openai.com/v1")
+    if provider == "openai":
         response = client.responses.create(
             model=model_name,
             #reasoning={"effort": "high"},
-            input=[{"role": "user", "content": prompt}],
+            input=openai_input(prompt, image_path),
         )
-        return response.output_text.strip(), time.time() - start
+        return response.output_text.strip(), response_usage(provider, response, start)
 
     # -------------------------------------------------------------
-    # CASE 3 — Claude (Anthropic)
+    # CASE 2 — Claude (Anthropic)
     # -------------------------------------------------------------
-    if model_name.startswith("claude"):
-        client = anthropic.Anthropic(api_key=api_key)
+    if provider == "anthropic":
         response = client.messages.create(
             model=model_name,
             messages=[{"role": "user", "content": prompt}],
-            max_tokens=4096
+            max_tokens=CLAUDE_MAX_TOKENS
         )
-        return response.content[0].text.strip(), time.time() - start
+        return response.content[0].text.strip(), response_usage(provider, response, start)
 
     # -------------------------------------------------------------
-    # CASE 4 — Gemini
+    # CASE 3 — Gemini
     # -------------------------------------------------------------
-    if model_name.startswith("gemini"):
-        client = genai.Client(api_key=api_key)
+    if provider == "gemini":
         response = client.models.generate_content(model=model_name, contents=prompt)
-        return response.text.strip(), time.time() - start
\ No newline at end of file
+        return response.text.strip(), response_usage(provider, response, start)
+
+
+async def acall_llm(model_name, api_key, prompt, image_path=None, base_url=None):
+    """Async counterpart of call_llm, using each SDK's async client."""
+
+    start = time.time()
+    provider = provider_for(model_name, image=bool(image_path))
+    base_url = base_url or DEFAULT_BASE_URLS.get(provider)
+
+    if provider == "stub":
+        stub = import_provider("stub")
+        text = await stub.acomplete(model_name, prompt)
+        return text, usage(start, stub.count_tokens(prompt), stub.count_tokens(text))
+
+    client = get_client(provider, api_key, base_url, use_async=True)
+
+    if provider == "openai":
+        response = await client.responses.create(
+            model=model_name,
+            input=openai_input(prompt, image_path),
+        )
+        return response.output_text.strip(), response_usage(provider, response, start)
+
+    if provider == "anthropic":
+        response = await client.messages.create(
+            model=model_name,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=CLAUDE_MAX_TOKENS
+        )
+        return response.content[0].text.strip(), response_usage(provider, response, start)
+
+    if provider == "gemini":
+        response = await client.aio.models.generate_content(model=model_name, contents=prompt)
+        return response.text.strip(), response_usage(provider, response, start)
+
+
+# -------------------------------------------------------------
+# Streaming: text deltas as they arrive, so a caller can stop as
+# soon as the answer is known
+# -------------------------------------------------------------
+def stream_events(provider, client, model_name, prompt, image_path=None):
+    """Yield (text delta, token counts) pairs from a streamed provider call."""
+    if provider == "openai":
+        stream = client.responses.create(model=model_name, input=openai_input(prompt, image_path), stream=True)
+        try:
+            for event in stream:
+                if event.type == "response.output_text.delta":
+                    yield event.delta, {}
+                elif event.type == "response.completed" and event.response.usage:
+                    tokens = event.response.usage
+                    yield "", {"input_tokens": tokens.input_tokens, "output_tokens": tokens.output_tokens}
+        finally:
+            stream.close()
+
+    elif provider == "anthropic":
+        stream = client.messages.create(
+            model=model_name,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=CLAUDE_MAX_TOKENS,
+            stream=True,
+        )
+        try:
+            for event in stream:
+                if event.type == "message_start":
+                    yield "", {"input_tokens": event.message.usage.input_tokens}
+                elif event.type == "content_block_delta" and event.delta.type == "text_delta":
+                    yield event.delta.text, {}
+                elif event.type == "message_delta":
+                    yield "", {"output_tokens": event.usage.output_tokens}
+        finally:
+            stream.close()
+
+    elif provider == "gemini":
+        stream = client.models.generate_content_stream(model=model_name, contents=prompt)
+        try:
+            for chunk in stream:
+                meta = chunk.usage_metadata
+                counts = {}
+                if meta is not None and meta.candidates_token_count is not None:
+                    counts = {"input_tokens": meta.prompt_token_count, "output_tokens": meta.candidates_token_count}
+                yield chunk.text or "", counts
+        finally:
+            stream.close()
+
+
+async def astream_events(provider, client, model_name, prompt, image_path=None):
+    """Async counterpart of stream_events."""
+    if provider == "openai":
+        stream = await client.responses.create(model=model_name, input=openai_input(prompt, image_path),
+                                               stream=True)
+        try:
+            async for event in stream:
+                if event.type == "response.output_text.delta":
+                    yield event.delta, {}
+                elif event.type == "response.completed" and event.response.usage:
+                    tokens = event.response.usage
+                    yield "", {"input_tokens": tokens.input_tokens, "output_tokens": tokens.output_tokens}
+        finally:
+            await stream.close()
+
+    elif provider == "anthropic":
+        stream = await client.messages.create(
+            model=model_name,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=CLAUDE_MAX_TOKENS,
+            stream=True,
+        )
+        try:
+            async for event in stream:
+                if event.type == "message_start":
+                    yield "", {"input_tokens": event.message.usage.input_tokens}
+                elif event.type == "content_block_delta" and event.delta.type == "text_delta":
+                    yield event.delta.text, {}
+                elif event.type == "message_delta":
+                    yield "", {"output_tokens": event.usage.output_tokens}
+        finally:
+            await stream.close()
+
+    elif provider == "gemini":
+        stream = await client.aio.models.generate_content_stream(model=model_name, contents=prompt)
+        try:
+            async for chunk in stream:
+                meta = chunk.usage_metadata
+                counts = {}
+                if meta is not None and meta.candidates_token_count is not None:
+                    counts = {"input_tokens": meta.prompt_token_count, "output_tokens": meta.candidates_token_count}
+                yield chunk.text or "", counts
+        finally:
+            await stream.aclose()
+
+
+class StreamState:
+    """Text, time to first token and token counts accumulated from a stream."""
+
+    def __init__(self, start, stop=None):
+        self.start = start
+        self.stop = stop
+        self.text = ""
+        self.ttft = None
+        self.chunks = 0
+        self.counts = {}
+        self.stopped = False
+
+    def add(self, delta, counts):
+        """Take one event; True once `stop` says the text so far already holds the answer."""
+        self.counts.update(counts)
+        if not delta:
+            return False
+        if self.ttft is None:
+            self.ttft = time.time() - self.start
+        self.text += delta
+        self.chunks += 1
+        self.stopped = self.stop is not None and self.stop(self.text)
+        return self.stopped
+
+    def result(self):
+        # a stream closed early never reports its output tokens; count chunks instead
+        output_tokens = self.counts.get("output_tokens")
+        if self.stopped or output_tokens is None:
+            output_tokens = self.chunks
+        info = usage(self.start, self.counts.get("input_tokens"), output_tokens, ttft=self.ttft)
+        info["stopped_early"] = self.stopped
+        return self.text.strip(), info
+
+
+def stream_llm(model_name, api_key, prompt, image_path=None, base_url=None, stop=None):
+    """Streaming variant of call_llm.
+
+    `stop(text)` is checked after every delta; once it returns True the
+    stream is closed and the text received so far is returned."""
+    state = StreamState(time.time(), stop)
+    provider = provider_for(model_name, image=bool(image_path))
+    base_url = base_url or DEFAULT_BASE_URLS.get(provider)
+
+    if provider == "stub":
+        stub = import_provider("stub")
+        events = ((chunk, {}) for chunk in stub.stream(model_name, prompt))
+        state.counts["input_tokens"] = stub.count_tokens(prompt)
+    else:
+        client = get_client(provider, api_key, base_url)
+        events = stream_events(provider, client, model_name, prompt, image_path)
+
+    try:
+        for delta, counts in events:
+            if state.add(delta, counts):
+                break
+    finally:
+        events.close()
+    return state.result()
+
+
+async def astream_llm(model_name, api_key, prompt, image_path=None, base_url=None, stop=None):
+    """Async counterpart of stream_llm."""
+    state = StreamState(time.time(), stop)
+    provider = provider_for(model_name, image=bool(image_path))
+    base_url = base_url or DEFAULT_BASE_URLS.get(provider)
+
+    if provider == "stub":
+        stub = import_provider("stub")
+
+        async def stub_events():
+            async for chunk in stub.astream(model_name, prompt):
+                yield chunk, {}
+
+        events = stub_events()
+        state.counts["input_tokens"] = stub.count_tokens(prompt)
+    else:
+        client = get_client(provider, api_key, base_url, use_async=True)
+        events = astream_events(provider, client, model_name, prompt, image_path)
+
+    try:
+        async for delta, counts in events:
+            if state.add(delta, counts):
+                break
+    finally:
+        await events.aclose()
+    return state.result()
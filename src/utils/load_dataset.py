@@ -1,26 +1,118 @@
-from torch.utils.data import Dataset
 import json
+import os
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".idx.json"
+
+
+def format_sample(line):
+    line["ori_choices"] = list(line["choices"])
+    line["choices"] = "\nA: " + line["choices"][0] \
+                        + "\nB: " + line["choices"][1] \
+                        + "\nC: " + line["choices"][2] \
+                        + "\nD: " + line["choices"][3]
+    line["labels"] = ["A", "B", "C", "D"][line["labels"].index(1)]
+    return line
+
+
+def load_line_index(path):
+    """Byte offsets of every line of a JSONL file plus its unicode/category columns.
+
+    The index is persisted next to the file and rebuilt when the file's size
+    or modification time changes."""
+    st = os.stat(path)
+    source = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    index_path = path + INDEX_SUFFIX
+
+    if os.path.exists(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == INDEX_VERSION and index["source"] == source:
+            return index
+
+    offsets = [0]
+    columns = {"unicode": [], "category": []}
+    with open(path, "rb") as f:
+        for line in f:
+            offsets.append(offsets[-1] + len(line))
+            if not line.strip():
+                offsets.pop()
+                offsets[-1] += len(line)
+                continue
+            row = json.loads(line)
+            for key in columns:
+                columns[key].append(row[key])
+
+    index = {"version": INDEX_VERSION, "source": source, "offsets": offsets, "columns": columns}
+    try:
+        tmp = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp, index_path)
+    except OSError:
+        pass  # read-only data directory: keep the index in memory only
+    return index
+
+
+class JsonlRecords:
+    """Random access to a JSONL file: each record is read and parsed on access."""
+
+    def __init__(self, path):
+        index = load_line_index(path)
+        self.offsets = index["offsets"]
+        self.columns = index["columns"]
+        self.fd = os.open(path, os.O_RDONLY)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        return json.loads(os.pread(self.fd, end - start, start))
+
+    def __del__(self):
+        os.close(self.fd)
+
+
+class EmojiDataset:
+    """MCQ dataset backed by a JSONL file or a grid dataset (`*.grids.npy`, see
+    utils.grid_dataset). Records are only read when accessed; slicing and
+    filtering return views that share the underlying records."""
 
-class EmojiDataset(Dataset):
     def __init__(self, data_path):
-        samples = []
-        with open(data_path, "r") as f:
-            for line in f:
-                line = json.loads(line.strip())
-                line["ori_choices"] = str(line["choices"])
-                line["choices"] = "\nA: " + line["choices"][0] \
-                                    + "\nB: " + line["choices"][1] \
-                                    + "\nC: " + line["choices"][2] \
-                                    + "\nD: " + line["choices"][3]
-                line["labels"] = ["A", "B", "C", "D"][line["labels"].index(1)]
-                line["emoji_art"] = line["emoji_art"]
-                line["ascii_art"] = line["ascii_art"]
-                line["category"] = line["category"]
-                samples.append(line)
-        self.data = samples
+        if data_path.endswith(".grids.npy"):
+            # imported here so JSONL runs don't load numpy/scikit-image
+            from utils.grid_dataset import GridRecords
+            self.records = GridRecords(data_path)
+        else:
+            self.records = JsonlRecords(data_path)
+        self.indices = range(len(self.records))
+
+    def view(self, indices):
+        view = object.__new__(type(self))
+        view.records = self.records
+        view.indices = indices
+        return view
+
+    def filter(self, category=None, unicode=None):
+        """View of the items matching the given category and/or unicode(s)."""
+        def wanted(value):
+            if value is None:
+                return None
+            return {value} if isinstance(value, str) else set(value)
+
+        categories, unicodes = wanted(category), wanted(unicode)
+        cat_col, uni_col = self.records.columns["category"], self.records.columns["unicode"]
+        return self.view([
+            i for i in self.indices
+            if (categories is None or cat_col[i] in categories)
+            and (unicodes is None or uni_col[i] in unicodes)
+        ])
 
     def __len__(self):
-        return len(self.data)
-    
+        return len(self.indices)
+
     def __getitem__(self, idx):
-        return self.data[idx] 
\ No newline at end of file
+        if isinstance(idx, slice):
+            return self.view(self.indices[idx])
+        return format_sample(self.records[self.indices[idx]])
@@ -0,0 +1,114 @@
+"""Per-call latency, token and throughput metrics for evaluation runs."""
+import threading
+import time
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentiles(values):
+    """p50/p90/p99 and mean of a list of numbers (None when it is empty)."""
+    if not values:
+        return None
+    # linear interpolation between closest ranks, like numpy.percentile; numpy is
+    # not imported here to keep it off evaluation.py's startup path
+    ordered = sorted(values)
+    stats = {}
+    for q in PERCENTILES:
+        pos = (len(ordered) - 1) * q / 100
+        lo = int(pos)
+        hi = min(lo + 1, len(ordered) - 1)
+        stats[f"p{q}"] = float(ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo))
+    stats["mean"] = sum(ordered) / len(ordered)
+    stats["count"] = len(values)
+    return stats
+
+
+class CallMetrics:
+    """Collects one record per API call (cache hits are not calls).
+
+    Every record holds the call's latency, time to first token when the call
+    was streamed, input/output tokens, the number of retries it took, whether
+    the stream was closed early and the error it finally failed with, if any."""
+
+    def __init__(self):
+        self.records = []
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def record(self, usage=None, retries=0, error=None):
+        usage = usage or {}
+        with self.lock:
+            self.records.append({
+                "latency": usage.get("latency"),
+                "ttft": usage.get("ttft"),
+                "input_tokens": usage.get("input_tokens"),
+                "output_tokens": usage.get("output_tokens"),
+                "retries": retries,
+                "stopped_early": bool(usage.get("stopped_early")),
+                "error": None if error is None else type(error).__name__,
+            })
+
+    def summary(self):
+        with self.lock:
+            records = list(self.records)
+        wall = time.time() - self.started
+        ok = [r for r in records if r["error"] is None]
+
+        def column(name):
+            return [r[name] for r in ok if r[name] is not None]
+
+        output_tokens = sum(column("output_tokens"))
+        busy = sum(column("latency"))
+        return {
+            "requests": len(records),
+            "errors": len(records) - len(ok),
+            "retries": sum(r["retries"] for r in records),
+            "stopped_early": sum(r["stopped_early"] for r in records),
+            "latency": percentiles(column("latency")),
+            "ttft": percentiles(column("ttft")),
+            "input_tokens": sum(column("input_tokens")),
+            "output_tokens": output_tokens,
+            "wall_seconds": wall,
+            "requests_per_second": len(records) / wall if wall > 0 else 0,
+            # generation speed while a call is in flight, and end-to-end throughput
+            "output_tokens_per_call_second": output_tokens / busy if busy > 0 else 0,
+            "output_tokens_per_second": output_tokens / wall if wall > 0 else 0,
+        }
+
+
+def prometheus_text(model_name, summary, prefix="emoji_eval"):
+    """Render a metrics summary in the Prometheus text exposition format."""
+    label = '{model="%s"}' % model_name.replace("\\", "\\\\").replace('"', '\\"')
+    lines = []
+
+    def metric(name, kind, help_text, value, labels=label):
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        lines.append(f"{prefix}_{name}{labels} {value}")
+
+    metric("requests_total", "counter", "API calls made.", summary["requests"])
+    metric("errors_total", "counter", "API calls that failed after retries.", summary["errors"])
+    metric("retries_total", "counter", "Retried attempts.", summary["retries"])
+    metric("input_tokens_total", "counter", "Prompt tokens sent.", summary["input_tokens"])
+    metric("output_tokens_total", "counter", "Completion tokens received.", summary["output_tokens"])
+    metric("requests_per_second", "gauge", "Calls per second of wall time.", summary["requests_per_second"])
+    metric("output_tokens_per_second", "gauge", "Completion tokens per second of wall time.",
+           summary["output_tokens_per_second"])
+
+    for name, help_text in (("latency", "Per-call latency"), ("ttft", "Time to first token")):
+        stats = summary[name]
+        if stats is None:
+            continue
+        lines.append(f"# HELP {prefix}_{name}_seconds {help_text} in seconds.")
+        lines.append(f"# TYPE {prefix}_{name}_seconds summary")
+        for q in PERCENTILES:
+            quantile = label[:-1] + f',quantile="{q / 100}"' + "}"
+            lines.append(f"{prefix}_{name}_seconds{quantile} {stats[f'p{q}']}")
+        lines.append(f"{prefix}_{name}_seconds_sum{label} {stats['mean'] * stats['count']}")
+        lines.append(f"{prefix}_{name}_seconds_count{label} {stats['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path, model_name, summary):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(prometheus_text(model_name, summary))
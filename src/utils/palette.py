@@ -0,0 +1,101 @@
+import numpy as np
+from skimage import color
+
+FULL_SPACE = "　"
+
+emoji_ascii_map = {
+    "🟥": '@',
+    "🟧": '%',
+    "🟨": '*',
+    "🟩": '+',
+    "🟦": '=',
+    "🟪": '-',
+    "⬛": ':',
+    "🟫": '#',
+    "⬜": '.'
+}
+
+palette = {
+    "🟥": np.array([222, 37, 43, 255]),
+    "🟧": np.array([255, 125, 41, 255]),
+    "🟨": np.array([253, 203, 50, 255]),
+    "🟩": np.array([59, 183, 95, 255]),
+    "🟦": np.array([47, 112, 205, 255]),
+    "🟪": np.array([151, 75, 181, 255]),
+    "⬛": np.array([44, 44, 46, 255]),
+    "🟫": np.array([121, 70, 45, 255]),
+    "⬜": np.array([242, 242, 243, 255])
+}
+
+
+class PaletteQuantizer:
+    """Maps RGBA pixels to the nearest palette entry (CIEDE2000 in Lab space).
+
+    Grids are represented as arrays of palette indices; transparent pixels get
+    the extra index ``len(palette)`` which renders as a full-width space.
+    """
+
+    def __init__(self, palette, ascii_map=emoji_ascii_map, alpha_threshold=128):
+        self.emojis = list(palette.keys())
+        self.rgb = np.array([v[:3] for v in palette.values()], dtype=np.uint8)
+        self.lab = rgb_to_lab(self.rgb)
+        self.transparent = len(self.emojis)
+        self.alpha_threshold = alpha_threshold
+        # optional memo of nearest palette colors (see utils.color_memo), used by quantize()
+        self.color_memo = None
+
+        # index -> text lookup tables, the last slot is the transparent cell
+        self.emoji_lut = np.array(self.emojis + [FULL_SPACE], dtype=object)
+        self.ascii_lut = np.array(
+            [ascii_map[e] * 2 for e in self.emojis] + [FULL_SPACE], dtype=object
+        )
+        self.emoji_to_index = {e: i for i, e in enumerate(self.emoji_lut)}
+
+    def nearest(self, rgb):
+        """Palette index and delta-E for an (N, 3) uint8 array of colors."""
+        if len(rgb) == 0:
+            return np.empty(0, dtype=np.uint8), np.empty(0, dtype=np.float64)
+        lab = rgb_to_lab(rgb)
+        dists = color.deltaE_ciede2000(lab[:, None, :], self.lab[None, :, :])
+        idx = np.argmin(dists, axis=1)
+        return idx.astype(np.uint8), dists[np.arange(len(idx)), idx]
+
+    def quantize(self, arr):
+        """Quantize an (H, W, 4) RGBA array.
+
+        Returns the (H, W) uint8 index grid and the delta-E of every opaque pixel.
+        """
+        arr = np.asarray(arr)
+        opaque = arr[..., 3] >= self.alpha_threshold
+        grid = np.full(arr.shape[:2], self.transparent, dtype=np.uint8)
+        nearest = self.color_memo.nearest if self.color_memo is not None else self.nearest
+        idx, deltas = nearest(arr[opaque][:, :3])
+        grid[opaque] = idx
+        return grid, deltas
+
+    def render_emoji(self, grid):
+        return render(grid, self.emoji_lut)
+
+    def render_ascii(self, grid):
+        return render(grid, self.ascii_lut)
+
+    def parse_emoji(self, emoji_art):
+        """Inverse of render_emoji: turn emoji art text back into an index grid."""
+        lookup = self.emoji_to_index
+        return np.array([[lookup[ch] for ch in row] for row in emoji_art.split("\n")], dtype=np.uint8)
+
+    def colors(self, grid):
+        """Emojis used in a grid, in palette order."""
+        used = np.bincount(grid.ravel(), minlength=self.transparent + 1)
+        return [e for e, n in zip(self.emojis, used) if n]
+
+
+def render(grid, lut):
+    """Render an index grid as text through an index -> string lookup table."""
+    return "\n".join("".join(row) for row in lut[grid])
+
+
+def rgb_to_lab(rgb):
+    """Convert an (N, 3) uint8 array of colors to an (N, 3) Lab array."""
+    rgb = np.asarray(rgb, dtype=np.float64).reshape(-1, 1, 3) / 255.0
+    return color.rgb2lab(rgb).reshape(-1, 3)
@@ -1,29 +1,83 @@
+import functools
 import re
 
 LETTER_RE = re.compile(r'\b([A-D])\b', re.IGNORECASE)
+# an explicit "Answer: B" / "the answer is **B**." with something after the letter
+FINAL_ANSWER_RE = re.compile(r'(?i:\banswer)\s*(?:(?i:is)\s*)?[:：]?\s*[*_(\[]*([A-D])(?=\W)')
+# the same in a complete response, where the letter may end the text
+STATED_ANSWER_RE = re.compile(r'(?i:\banswer)\s*(?:(?i:is)\s*)?[:：]?\s*[*_(\[]*([A-D])(?!\w)')
+# "3: B", "**3.** (B)", "Question 3 - B" at the start of a line; the letter must be
+# uppercase so numbered prose such as "1. a cat ..." is not read as an answer
+PACKED_ANSWER_RE = re.compile(
+    r'^[\s*#>-]*(?:(?i:question)\s*)?(\d+)[\s*]*[:.)\-=]+[\s*]*\(?([A-D])\b',
+    re.MULTILINE,
+)
 
-def postprocess_answer(prediction, target, choices):
-    pred = prediction.strip()
+def has_final_answer(text):
+    """True once a (partial) response states its final answer explicitly."""
+    return FINAL_ANSWER_RE.search(text) is not None
 
-    # --- Method 1: extract letter via regex ---
-    letters = LETTER_RE.findall(pred)
-    if letters:
-        answer = letters[-1].upper()   # last mentioned letter
-        return answer == target
+def last_letter(response, choices=None):
+    """The last standalone A-D in the response."""
+    letters = LETTER_RE.findall(response)
+    return letters[-1].upper() if letters else None
 
-    # --- Method 2: fallback - match choice text ---
-    pred_lower = pred.lower()
-    matches = []
+def stated_answer(response, choices=None):
+    """The letter of the last explicit "Answer: X" in the response."""
+    letters = STATED_ANSWER_RE.findall(response)
+    return letters[-1] if letters else None
+
+@functools.lru_cache(maxsize=None)
+def choice_pattern(text):
+    return re.compile(re.escape(text.lower()))
 
+def choice_text(response, choices):
+    """Letter of the choice whose text is mentioned last in the response."""
+    pred_lower = response.lower()
+    matches = []
     for idx, ctext in enumerate(choices):
-        c_low = ctext.lower()
-        for m in re.finditer(re.escape(c_low), pred_lower):
+        for m in choice_pattern(ctext).finditer(pred_lower):
             matches.append((m.start(), idx))
-
     if matches:
         _, last_idx = max(matches, key=lambda x: x[0])
-        answer = "ABCD"[last_idx]
-        return answer == target
+        return "ABCD"[last_idx]
+    return None
+
+def first_of(*extractors):
+    """Extraction strategy that tries each extractor in turn."""
+    def extract(response, choices):
+        for extractor in extractors:
+            answer = extractor(response, choices)
+            if answer is not None:
+                return answer
+        return None
+    return extract
+
+# Answer-extraction strategies: (response, list of choice texts) -> letter or None
+STRATEGIES = {
+    # last letter mentioned, falling back to choice text (what evaluation uses)
+    "default": first_of(last_letter, choice_text),
+    # an explicit "Answer: X" first, for responses that reason before answering
+    "stated": first_of(stated_answer, last_letter, choice_text),
+    "last_letter": last_letter,
+    "choice_text": choice_text,
+}
+
+def extract_answer(response, choices, strategy="default"):
+    return STRATEGIES[strategy](response.strip(), choices)
+
+def postprocess_answer(prediction, target, choices, strategy="default"):
+    """Whether the prediction answers `target`; choices is the list of choice texts."""
+    return extract_answer(prediction, choices, strategy) == target
+
+def parse_packed_answers(response, count):
+    """Map question numbers 1..count to the letter answered for them.
 
-    # No letter, no choice text → fail
-    return False
\ No newline at end of file
+    The last answer given for a number wins, so reasoning that precedes the
+    final list does not count; unanswered numbers are missing from the result."""
+    answers = {}
+    for number, letter in PACKED_ANSWER_RE.findall(response):
+        number = int(number)
+        if 1 <= number <= count:
+            answers[number] = letter
+    return answers
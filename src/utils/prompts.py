@@ -1,3 +1,7 @@
-TEXT_ONLY_PROMPT = """Please answer the multiple-choice question based on the given 10x10 emoji art:\n\n[EMOJI ART]\n{emoji_art}\n\n[Question]\nWhat is depicted in the above emoji art?\n\n[Choices]\n{choices}\n\nYour final answer should be a single letter only (A, B, C, or D)."""
+TEXT_ONLY_PROMPT = """Please answer the multiple-choice question based on the given {size}x{size} emoji art:\n\n[EMOJI ART]\n{emoji_art}\n\n[Question]\nWhat is depicted in the above emoji art?\n\n[Choices]\n{choices}\n\nYour final answer should be a single letter only (A, B, C, or D)."""
 
-IMAGE_ONLY_PROMPT = """Please answer the multiple-choice question based on the given 10x10 pixel art image.\n\n[Question]\nWhat is depicted in the above pixel art?\n\n[Choices]\n{choices}\n\nYour final answer should be a single letter only (A, B, C, or D)."""
\ No newline at end of file
+IMAGE_ONLY_PROMPT = """Please answer the multiple-choice question based on the given {size}x{size} pixel art image.\n\n[Question]\nWhat is depicted in the above pixel art?\n\n[Choices]\n{choices}\n\nYour final answer should be a single letter only (A, B, C, or D)."""
+
+PACKED_PROMPT = """Please answer each of the following {count} multiple-choice questions based on its emoji art. The questions are independent of each other.\n\n{questions}\n\nAnswer every question on its own line as "<question number>: <letter>", for example:\n1: A\n2: C\n\nYour final answer should list a single letter (A, B, C, or D) for each of the {count} questions."""
+
+PACKED_QUESTION = """[Question {number}]\nWhat is depicted in the following {size}x{size} emoji art?\n\n[EMOJI ART]\n{emoji_art}\n\n[Choices]\n{choices}"""
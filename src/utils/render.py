@@ -0,0 +1,95 @@
+"""Render dataset grids as upscaled pixel-art PNGs for image mode.
+
+Images are produced from the emoji art itself, so image mode no longer
+needs the original emoji directory. GridImages renders on demand behind an
+LRU cache; build_archive/ImageArchive precompute a whole dataset slice as
+base64 data URLs that are loaded once per run.
+"""
+import base64
+import io
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from utils.palette import PaletteQuantizer, palette
+
+ARCHIVE_VERSION = 1
+DEFAULT_SCALE = 32
+
+
+def grid_png(grid, colors, scale=DEFAULT_SCALE):
+    """PNG bytes of an (H, W) index grid, each cell a scale x scale block of colors[index]."""
+    height, width = grid.shape
+    img = Image.fromarray(colors[grid], "RGBA").resize((width * scale, height * scale), Image.NEAREST)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def data_url(png):
+    return "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+
+
+class GridImages:
+    """Renders dataset items to PNG data URLs, keeping the most recent `max_items`."""
+
+    def __init__(self, scale=DEFAULT_SCALE, max_items=4096, quantizer=None):
+        self.quantizer = quantizer or PaletteQuantizer(palette)
+        self.scale = scale
+        self.max_items = max_items
+        # palette colors, opaque, plus a fully transparent slot for empty cells
+        self.colors = np.zeros((self.quantizer.transparent + 1, 4), dtype=np.uint8)
+        self.colors[:-1, :3] = self.quantizer.rgb
+        self.colors[:-1, 3] = 255
+        self.cache = OrderedDict()
+
+    def render(self, emoji_art):
+        return data_url(grid_png(self.quantizer.parse_emoji(emoji_art), self.colors, self.scale))
+
+    def image_for(self, data):
+        key = data["emoji_art"]
+        url = self.cache.get(key)
+        if url is not None:
+            self.cache.move_to_end(key)
+            return url
+        url = self.cache[key] = self.render(key)
+        if len(self.cache) > self.max_items:
+            self.cache.popitem(last=False)
+        return url
+
+
+def build_archive(rows, path, scale=DEFAULT_SCALE):
+    """Render every row once and store the data URLs, keyed by unicode, in one JSON file."""
+    images = GridImages(scale=scale, max_items=1)
+    archive = {"version": ARCHIVE_VERSION, "scale": scale, "images": {}}
+    for row in rows:
+        if row["unicode"] not in archive["images"]:
+            archive["images"][row["unicode"]] = images.render(row["emoji_art"])
+
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(archive, f)
+    os.replace(tmp, path)
+    return len(archive["images"])
+
+
+class ImageArchive:
+    """Read side of build_archive: every image is held in memory, ready to send."""
+
+    def __init__(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            archive = json.load(f)
+        if archive.get("version") != ARCHIVE_VERSION:
+            raise ValueError(f"Unsupported image archive version in {path}: {archive.get('version')}")
+        self.path = path
+        self.scale = archive["scale"]
+        self.images = archive["images"]
+
+    def image_for(self, data):
+        try:
+            return self.images[data["unicode"]]
+        except KeyError:
+            raise KeyError(f"{data['unicode']} is not in image archive {self.path}") from None
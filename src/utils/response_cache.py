@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);
+CREATE INDEX IF NOT EXISTS responses_created ON responses (created_at);
+"""
+
+
+class CacheMiss(Exception):
+    """Raised in replay mode for requests that are not in the cache."""
+
+
+def request_key(model_name, prompt, image_bytes=None, params=None):
+    """Content hash of everything that determines a model's response."""
+    h = hashlib.sha256()
+    h.update(json.dumps([model_name, prompt, params or {}], sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    if image_bytes:
+        h.update(b"\0image\0")
+        h.update(image_bytes)
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """Persistent SQLite cache of LLM responses keyed by request_key().
+
+    mode="readwrite"  serve hits, call and store on misses
+    mode="replay"     serve hits, raise CacheMiss on misses (no network)
+
+    Entries older than max_age seconds are dropped, and the least recently
+    used entries are evicted once the cache exceeds max_bytes. Identical
+    requests in flight at the same time are only issued once.
+    """
+
+    def __init__(self, path, mode="readwrite", max_bytes=None, max_age=None, evict_every=100):
+        if mode not in ("readwrite", "replay"):
+            raise ValueError(f"Invalid cache mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.evict_every = evict_every
+        self.puts = 0
+        self.hits = 0
+        self.misses = 0
+
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.evict()
+
+        self.inflight = {}
+        self.ainflight = {}
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+        return json.loads(row[0])
+
+    def put(self, key, model_name, value):
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_name, data, len(data.encode("utf-8")), now, now),
+            )
+            self.db.commit()
+            self.puts += 1
+        if self.puts % self.evict_every == 0:
+            self.evict()
+
+    def evict(self):
+        with self.lock:
+            if self.max_age is not None:
+                self.db.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age,))
+            if self.max_bytes is not None:
+                total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                if total > self.max_bytes:
+                    # walk entries from least recently used until enough has been freed
+                    excess, cutoff = total - self.max_bytes, None
+                    for accessed_at, size in self.db.execute(
+                            "SELECT accessed_at, size FROM responses ORDER BY accessed_at"):
+                        excess -= size
+                        cutoff = accessed_at
+                        if excess <= 0:
+                            break
+                    self.db.execute("DELETE FROM responses WHERE accessed_at <= ?", (cutoff,))
+            self.db.commit()
+
+    def lookup(self, key):
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        if self.mode == "replay":
+            raise CacheMiss(f"No cached response for request {key[:12]}")
+        return None
+
+    def call(self, key, model_name, fn, *args, **kwargs):
+        """Return the cached value for key, or compute it with fn and store it."""
+        value = self.lookup(key)
+        if value is not None:
+            return value
+
+        with self.lock:
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self.inflight[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            value = fn(*args, **kwargs)
+            self.put(key, model_name, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+
+    async def acall(self, key, model_name, fn, *args, **kwargs):
+        """Async variant of call(); fn is a coroutine function."""
+        value = self.lookup(key)
+        if value is not None:
+            return value
+
+        future = self.ainflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = self.ainflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await fn(*args, **kwargs)
+            self.put(key, model_name, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            # nobody else may be waiting; don't warn about an unretrieved exception
+            future.exception()
+            raise
+        finally:
+            del self.ainflight[key]
+
+    def close(self):
+        with self.lock:
+            self.db.close()
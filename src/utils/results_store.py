@@ -0,0 +1,208 @@
+"""SQLite store of per-item results across many runs.
+
+Every results file becomes one row of `runs` and one row of `items` per
+detailed result, with indexes for the usual cross-run questions (accuracy
+by category, items every model fails, regressions between two runs). The
+legacy results JSON can be rebuilt from a stored run.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from utils.journal import result_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    model TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    source_path TEXT,
+    sha256 TEXT,
+    items INTEGER NOT NULL,
+    extras TEXT NOT NULL,
+    ingested_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_model ON runs (model, mode);
+CREATE TABLE IF NOT EXISTS items (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    item_key TEXT NOT NULL,
+    unicode TEXT NOT NULL,
+    variant,  -- variant number as the dataset gave it
+    name TEXT,
+    category TEXT NOT NULL,
+    target TEXT,
+    response TEXT,
+    error TEXT,
+    correct INTEGER NOT NULL,
+    packed INTEGER,
+    latency REAL,
+    input_tokens INTEGER,
+    output_tokens INTEGER,
+    extra TEXT,
+    UNIQUE (run_id, item_key)
+);
+CREATE INDEX IF NOT EXISTS items_category ON items (run_id, category, correct);
+CREATE INDEX IF NOT EXISTS items_key ON items (item_key, run_id, correct);
+"""
+
+# top-level keys rebuilt from the items on export; any others are kept in runs.extras
+SUMMARY_KEYS = ("model", "mode", "overall", "per_category", "detailed_results")
+
+# result fields stored in their own columns, in the order evaluation.py writes them
+COLUMNS = ("unicode", "name", "category", "response", "error", "correct", "target",
+           "latency", "input_tokens", "output_tokens", "variant", "packed")
+
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def run_name(path):
+    """Default run name: the file name without extension, e.g. out-gpt-4o."""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+class ResultsStore:
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(SCHEMA)
+
+    def ingest(self, path, name=None, replace=False):
+        """Store a results file; returns False when it is already stored unchanged.
+
+        A different file under an existing run name is an error unless `replace`."""
+        name = name or run_name(path)
+        sha = file_sha256(path)
+        row = self.db.execute("SELECT sha256 FROM runs WHERE name = ?", (name,)).fetchone()
+        if row is not None:
+            if row[0] == sha:
+                return False
+            if not replace:
+                raise ValueError(f"Run {name} is already stored from a different file; use replace")
+
+        with open(path, "r", encoding="utf-8") as f:
+            output = json.load(f)
+        results = output["detailed_results"]
+        extras = {k: v for k, v in output.items() if k not in SUMMARY_KEYS}
+
+        with self.db:
+            self.db.execute("DELETE FROM runs WHERE name = ?", (name,))
+            cur = self.db.execute(
+                "INSERT INTO runs (name, model, mode, source_path, sha256, items, extras, ingested_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, output["model"], output.get("mode", "text"), os.path.abspath(path), sha, len(results),
+                 json.dumps(extras, ensure_ascii=False), time.time()),
+            )
+            run_id = cur.lastrowid
+            self.db.executemany(
+                "INSERT INTO items (run_id, position, item_key, unicode, variant, name, category, target, "
+                "response, error, correct, packed, latency, input_tokens, output_tokens, extra) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [self._item_row(run_id, position, result) for position, result in enumerate(results)],
+            )
+        return True
+
+    @staticmethod
+    def _item_row(run_id, position, result):
+        extra = {k: v for k, v in result.items() if k not in COLUMNS}
+        packed = result.get("packed")
+        return (
+            run_id, position, result_key(result), result["unicode"],
+            result.get("variant"), result.get("name"), result["category"],
+            result.get("target"), result.get("response"), result.get("error"), int(bool(result["correct"])),
+            None if packed is None else int(packed), result.get("latency"), result.get("input_tokens"),
+            result.get("output_tokens"), json.dumps(extra, ensure_ascii=False) if extra else None,
+        )
+
+    def run_id(self, name):
+        row = self.db.execute("SELECT id FROM runs WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(f"No run named {name} in {self.path}")
+        return row[0]
+
+    def runs(self, model=None, mode=None):
+        """(name, model, mode, items, correct, source_path) of the matching runs."""
+        where, params = self._run_filter(model, mode)
+        return self.db.execute(
+            "SELECT r.name, r.model, r.mode, r.items, "
+            "(SELECT COALESCE(SUM(correct), 0) FROM items WHERE run_id = r.id), r.source_path "
+            f"FROM runs r {where} ORDER BY r.name", params
+        ).fetchall()
+
+    def category_accuracy(self, model=None, mode=None):
+        """(run, category, total, correct) for every matching run."""
+        where, params = self._run_filter(model, mode)
+        return self.db.execute(
+            "SELECT r.name, i.category, COUNT(*), SUM(i.correct) FROM runs r "
+            f"JOIN items i ON i.run_id = r.id {where} "
+            "GROUP BY r.id, i.category ORDER BY r.name, i.category", params
+        ).fetchall()
+
+    def always_failed(self, names=None):
+        """(unicode, variant, name, category, target) of items no given run answered correctly.
+
+        Only items present in every run count; all runs when `names` is empty."""
+        names = names or [row[0] for row in self.runs()]
+        ids = [self.run_id(name) for name in names]
+        marks = ", ".join("?" * len(ids))
+        return self.db.execute(
+            "SELECT unicode, variant, name, category, target FROM items "
+            f"WHERE run_id IN ({marks}) GROUP BY item_key "
+            "HAVING SUM(correct) = 0 AND COUNT(*) = ? ORDER BY MIN(position)", (*ids, len(ids))
+        ).fetchall()
+
+    def regressions(self, base, new):
+        """(unicode, variant, category, target, new response) of items `base` got right and `new` got wrong."""
+        return self.db.execute(
+            "SELECT b.unicode, b.variant, b.category, b.target, COALESCE(n.response, n.error) "
+            "FROM items b JOIN items n ON n.item_key = b.item_key AND n.run_id = ? "
+            "WHERE b.run_id = ? AND b.correct = 1 AND n.correct = 0 ORDER BY b.position",
+            (self.run_id(new), self.run_id(base)),
+        ).fetchall()
+
+    def run_results(self, name):
+        """(model, mode, extras, detailed results) of a stored run, as its results file had them."""
+        run_id = self.run_id(name)
+        model, mode, extras = self.db.execute(
+            "SELECT model, mode, extras FROM runs WHERE id = ?", (run_id,)
+        ).fetchone()
+        rows = self.db.execute(
+            f"SELECT {', '.join(COLUMNS)}, extra FROM items WHERE run_id = ? ORDER BY position", (run_id,)
+        )
+        results = []
+        for row in rows:
+            result = {k: v for k, v in zip(COLUMNS, row) if v is not None}
+            result["correct"] = bool(result["correct"])
+            if "packed" in result:
+                result["packed"] = bool(result["packed"])
+            if row[-1]:
+                result.update(json.loads(row[-1]))
+            results.append(result)
+        return model, mode, json.loads(extras), results
+
+    def remove(self, name):
+        with self.db:
+            self.db.execute("DELETE FROM runs WHERE id = ?", (self.run_id(name),))
+
+    @staticmethod
+    def _run_filter(model, mode):
+        clauses, params = [], []
+        if model:
+            clauses.append("r.model = ?")
+            params.append(model)
+        if mode:
+            clauses.append("r.mode = ?")
+            params.append(mode)
+        return ("WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def close(self):
+        self.db.close()
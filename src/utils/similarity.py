@@ -0,0 +1,67 @@
+import numpy as np
+
+
+class GridSimilarityIndex:
+    """Nearest-neighbour search over palette-index grids.
+
+    Distances are computed block by block with matrix products, so memory is
+    bounded by ``block_size * len(candidates)`` regardless of dataset size.
+
+    metric="hamming"    number of cells whose palette index differs
+    metric="histogram"  squared Euclidean distance between normalized
+                        palette-color histograms
+    """
+
+    def __init__(self, grids, n_colors, metric="hamming", block_size=1024):
+        grids = np.asarray(grids)
+        n = len(grids)
+        flat = grids.reshape(n, -1).astype(np.int64)
+        self.n_cells = flat.shape[1]
+        self.metric = metric
+        self.block_size = block_size
+
+        if metric == "hamming":
+            # one-hot cells: matching cells between two grids is a dot product
+            feats = np.zeros((n, self.n_cells * n_colors), dtype=np.float32)
+            cols = np.arange(self.n_cells) * n_colors + flat
+            feats[np.arange(n)[:, None], cols] = 1.0
+        elif metric == "histogram":
+            counts = np.zeros((n, n_colors), dtype=np.float32)
+            np.add.at(counts, (np.repeat(np.arange(n), self.n_cells), flat.ravel()), 1.0)
+            feats = counts / self.n_cells
+        else:
+            raise ValueError(f"Invalid metric: {metric}")
+
+        # jitter used to break distance ties; hamming distances are integers
+        self.tie_eps = 0.5 if metric == "hamming" else 1e-9
+        self.feats = feats
+        self.sq_norms = (feats ** 2).sum(axis=1)
+
+    def distances(self, queries, candidates):
+        """(len(queries), len(candidates)) distances between two sets of item positions."""
+        a, b = self.feats[queries], self.feats[candidates]
+        if self.metric == "hamming":
+            return self.n_cells - a @ b.T
+        return np.maximum(self.sq_norms[queries][:, None] + self.sq_norms[candidates][None, :] - 2 * a @ b.T, 0)
+
+    def nearest(self, members, k, rng=None):
+        """k nearest other members for every item in `members`.
+
+        Returns an (len(members), k) array of item positions. Ties are broken
+        randomly when an rng is given."""
+        members = np.asarray(members)
+        if len(members) - 1 < k:
+            raise ValueError(f"Need at least {k + 1} items, got {len(members)}")
+
+        out = np.empty((len(members), k), dtype=np.int64)
+        for start in range(0, len(members), self.block_size):
+            block = np.arange(start, min(start + self.block_size, len(members)))
+            d = self.distances(members[block], members).astype(np.float64)
+            if rng is not None:
+                d += rng.random(d.shape) * self.tie_eps
+            d[np.arange(len(block)), block] = np.inf  # never pick the item itself
+
+            part = np.argpartition(d, k - 1, axis=1)[:, :k]
+            order = np.argsort(np.take_along_axis(d, part, axis=1), axis=1)
+            out[block] = members[np.take_along_axis(part, order, axis=1)]
+        return out
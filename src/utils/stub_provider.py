@@ -0,0 +1,106 @@
+"""Local stand-in for an LLM provider, for offline runs of the evaluation engine.
+
+Models whose name starts with "stub" are served here. Latency and failure
+rates come from the environment:
+
+    STUB_LATENCY        seconds per call, or to the first streamed chunk (default 0.05)
+    STUB_TOKEN_LATENCY  seconds per streamed chunk (default 0.002)
+    STUB_ERROR_RATE     fraction of calls failing with a 429 (default 0)
+
+Streamed calls (stream/astream) behave like a verbose model: a line of
+reasoning, "Answer: X", then a long explanation.
+"""
+import asyncio
+import hashlib
+import os
+import random
+import re
+import time
+
+PACKED_SECTION_RE = re.compile(r"^\[Question (\d+)\]$", re.MULTILINE)
+CHUNK_RE = re.compile(r"\S+\s*")
+
+REASONING = "Looking at the emoji art, the outline and the dominant colors are the main clues to what it shows."
+EXPLANATION = " ".join(
+    ["To double-check, compare the silhouette against each of the other choices; none of them "
+     "matches the colors and the overall outline as well as the chosen option does."] * 8
+)
+
+
+class StubRateLimitError(Exception):
+    status_code = 429
+
+
+def latency():
+    return float(os.environ.get("STUB_LATENCY", "0.05"))
+
+
+def token_latency():
+    return float(os.environ.get("STUB_TOKEN_LATENCY", "0.002"))
+
+
+def maybe_fail():
+    if random.random() < float(os.environ.get("STUB_ERROR_RATE", "0")):
+        raise StubRateLimitError("stub rate limit")
+
+
+def answer(model_name, prompt):
+    """Deterministic pseudo-answer derived from the model and prompt.
+
+    Packed prompts get one "<number>: <letter>" line per question section, with
+    roughly one question in eight left unanswered."""
+    parts = PACKED_SECTION_RE.split(prompt)
+    if len(parts) > 1:
+        lines = []
+        for number, section in zip(parts[1::2], parts[2::2]):
+            digest = hashlib.sha256(f"{model_name}\n{section}".encode("utf-8")).digest()
+            if digest[1] % 8:
+                lines.append(f"{number}: {'ABCD'[digest[0] % 4]}")
+        return "\n".join(lines)
+    digest = hashlib.sha256(f"{model_name}\n{prompt}".encode("utf-8")).digest()
+    return "ABCD"[digest[0] % 4]
+
+
+def count_tokens(text):
+    """Rough token count (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def complete(model_name, prompt):
+    time.sleep(latency())
+    maybe_fail()
+    return answer(model_name, prompt)
+
+
+async def acomplete(model_name, prompt):
+    await asyncio.sleep(latency())
+    maybe_fail()
+    return answer(model_name, prompt)
+
+
+def verbose_answer(model_name, prompt):
+    final = answer(model_name, prompt)
+    if not PACKED_SECTION_RE.search(prompt):
+        final = f"Answer: {final}"
+    return f"{REASONING}\n{final}\n\n{EXPLANATION}"
+
+
+def stream_chunks(model_name, prompt):
+    """The verbose answer split into word-sized chunks, roughly one token each."""
+    return CHUNK_RE.findall(verbose_answer(model_name, prompt))
+
+
+def stream(model_name, prompt):
+    time.sleep(latency())
+    maybe_fail()
+    for chunk in stream_chunks(model_name, prompt):
+        time.sleep(token_latency())
+        yield chunk
+
+
+async def astream(model_name, prompt):
+    await asyncio.sleep(latency())
+    maybe_fail()
+    for chunk in stream_chunks(model_name, prompt):
+        await asyncio.sleep(token_latency())
+        yield chunk
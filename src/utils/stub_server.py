@@ -0,0 +1,157 @@
+"""Local OpenAI/Anthropic-compatible HTTP stand-in for offline benchmarks.
+
+Serves POST .../responses, .../chat/completions and .../messages with the
+deterministic answers of utils.stub_provider, over HTTP/1.1 keep-alive.
+Requests with "stream": true get the verbose stub answer as server-sent events.
+"""
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils import stub_provider
+
+
+def prompt_text(body):
+    """Concatenated text of the request's messages / input."""
+    messages = body.get("input") or body.get("messages") or []
+    if isinstance(messages, str):
+        return messages
+    parts = []
+    for message in messages:
+        content = message.get("content", "")
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(c.get("text", "") for c in content if isinstance(c, dict))
+    return "\n".join(parts)
+
+
+def response_body(path, model, text):
+    usage_in, usage_out = 100, 1
+    if path.endswith("/responses"):
+        return {
+            "id": "resp_stub", "object": "response", "created_at": int(time.time()),
+            "model": model, "status": "completed",
+            "output": [{
+                "type": "message", "id": "msg_stub", "role": "assistant", "status": "completed",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }],
+            "parallel_tool_calls": False, "tool_choice": "auto", "tools": [],
+            "usage": {"input_tokens": usage_in, "output_tokens": usage_out,
+                      "total_tokens": usage_in + usage_out},
+        }
+    if path.endswith("/chat/completions"):
+        return {
+            "id": "chatcmpl_stub", "object": "chat.completion", "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": text}}],
+            "usage": {"prompt_tokens": usage_in, "completion_tokens": usage_out,
+                      "total_tokens": usage_in + usage_out},
+        }
+    return {
+        "id": "msg_stub", "type": "message", "role": "assistant", "model": model,
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn", "stop_sequence": None,
+        "usage": {"input_tokens": usage_in, "output_tokens": usage_out},
+    }
+
+
+def stream_events(path, model, chunks):
+    """(event name, data) server-sent events streaming chunks in the endpoint's format."""
+    usage_in, usage_out = 100, len(chunks)
+    if path.endswith("/responses"):
+        response = {
+            "id": "resp_stub", "object": "response", "created_at": int(time.time()),
+            "model": model, "status": "in_progress", "output": [],
+            "parallel_tool_calls": False, "tool_choice": "auto", "tools": [],
+        }
+        yield "response.created", {"type": "response.created", "sequence_number": 0, "response": response}
+        for i, chunk in enumerate(chunks, 1):
+            yield "response.output_text.delta", {
+                "type": "response.output_text.delta", "sequence_number": i, "item_id": "msg_stub",
+                "output_index": 0, "content_index": 0, "delta": chunk, "logprobs": [],
+            }
+        done = response_body(path, model, "".join(chunks))
+        done["usage"].update(output_tokens=usage_out, total_tokens=usage_in + usage_out)
+        yield "response.completed", {"type": "response.completed", "sequence_number": len(chunks) + 1,
+                                     "response": done}
+    elif path.endswith("/chat/completions"):
+        for chunk in chunks:
+            yield None, {"id": "chatcmpl_stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model, "choices": [{"index": 0, "delta": {"content": chunk}}]}
+        yield None, {"id": "chatcmpl_stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+    else:
+        message = response_body(path, model, "")
+        message.update(content=[], stop_reason=None)
+        message["usage"] = {"input_tokens": usage_in, "output_tokens": 0}
+        yield "message_start", {"type": "message_start", "message": message}
+        yield "content_block_start", {"type": "content_block_start", "index": 0,
+                                      "content_block": {"type": "text", "text": ""}}
+        for chunk in chunks:
+            yield "content_block_delta", {"type": "content_block_delta", "index": 0,
+                                          "delta": {"type": "text_delta", "text": chunk}}
+        yield "content_block_stop", {"type": "content_block_stop", "index": 0}
+        yield "message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                "usage": {"output_tokens": usage_out}}
+        yield "message_stop", {"type": "message_stop"}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # headers and body go out in separate writes; avoid Nagle/delayed-ACK stalls on keep-alive
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        time.sleep(stub_provider.latency())
+
+        model = body.get("model", "stub")
+        if body.get("stream"):
+            self.send_stream(model, stub_provider.stream_chunks(model, prompt_text(body)))
+            return
+        text = stub_provider.answer(model, prompt_text(body))
+        payload = json.dumps(response_body(self.path, model, text)).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_stream(self, model, chunks):
+        # no Content-Length: the stream ends when the connection closes
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            for i, (event, data) in enumerate(stream_events(self.path, model, chunks)):
+                if i:
+                    time.sleep(stub_provider.token_latency())
+                head = f"event: {event}\n" if event else ""
+                self.wfile.write(f"{head}data: {json.dumps(data)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            if self.path.endswith("/chat/completions"):
+                self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client stopped reading early
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host="127.0.0.1", port=0):
+    """Start the server in a daemon thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
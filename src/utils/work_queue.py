@@ -0,0 +1,119 @@
+"""SQLite work queue of evaluation shards with expiring leases.
+
+Workers in several processes, or on several hosts sharing a filesystem with
+working file locks, claim shards one at a time. A claim is a lease that the
+worker renews while it works; a shard whose lease expired (its worker died)
+is handed out again.
+"""
+import json
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    id INTEGER PRIMARY KEY,
+    start_idx INTEGER NOT NULL,
+    end_idx INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS shards_status ON shards (status, lease_expires);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+class WorkQueue:
+    def __init__(self, path, lease_seconds=600.0):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        # autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.executescript(SCHEMA)
+
+    def plan(self, start, end, shard_size, config):
+        """Split [start, end) into shards; a queue that already has a plan is left as is.
+
+        Returns False when the existing plan was made for a different config."""
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.db.execute("SELECT value FROM meta WHERE key = 'config'").fetchone()
+            if row is not None:
+                self.db.execute("COMMIT")
+                return json.loads(row[0]) == config
+            self.db.execute("INSERT INTO meta VALUES ('config', ?)", (json.dumps(config, sort_keys=True),))
+            self.db.executemany(
+                "INSERT INTO shards (start_idx, end_idx) VALUES (?, ?)",
+                [(lo, min(lo + shard_size, end)) for lo in range(start, end, shard_size)],
+            )
+            self.db.execute("COMMIT")
+            return True
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+
+    def config(self):
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'config'").fetchone()
+        if row is None:
+            raise ValueError(f"No shards have been planned in {self.path}")
+        return json.loads(row[0])
+
+    def claim(self, worker):
+        """Lease the next pending or abandoned shard: (id, start_idx, end_idx), or None."""
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.db.execute(
+                "SELECT id, start_idx, end_idx FROM shards "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY id LIMIT 1", (now,)
+            ).fetchone()
+            if row is not None:
+                self.db.execute(
+                    "UPDATE shards SET status = 'leased', worker = ?, lease_expires = ?, "
+                    "attempts = attempts + 1 WHERE id = ?",
+                    (worker, now + self.lease_seconds, row[0]),
+                )
+            self.db.execute("COMMIT")
+            return row
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+
+    def renew(self, shard_id, worker):
+        """Extend a lease; False if the shard was reclaimed by another worker."""
+        cur = self.db.execute(
+            "UPDATE shards SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+            (time.time() + self.lease_seconds, shard_id, worker),
+        )
+        return cur.rowcount == 1
+
+    def complete(self, shard_id, worker):
+        cur = self.db.execute(
+            "UPDATE shards SET status = 'done', lease_expires = NULL "
+            "WHERE id = ? AND worker = ? AND status = 'leased'",
+            (shard_id, worker),
+        )
+        return cur.rowcount == 1
+
+    def release(self, shard_id, worker):
+        """Give a shard back, e.g. after a failure, so another worker can take it."""
+        self.db.execute(
+            "UPDATE shards SET status = 'pending', worker = NULL, lease_expires = NULL "
+            "WHERE id = ? AND worker = ? AND status = 'leased'",
+            (shard_id, worker),
+        )
+
+    def shards(self):
+        return self.db.execute(
+            "SELECT id, start_idx, end_idx, status, worker, attempts FROM shards ORDER BY id"
+        ).fetchall()
+
+    def counts(self):
+        counts = {"pending": 0, "leased": 0, "done": 0}
+        counts.update(self.db.execute("SELECT status, COUNT(*) FROM shards GROUP BY status").fetchall())
+        return counts
+
+    def close(self):
+        self.db.close()